@@ -1,16 +1,21 @@
 # app.py
 
+import asyncio
 import base64
+import hmac
+import itertools
+import json
 import logging
 import os
+import zipfile
 from io import BytesIO
-from typing import Any, List, Optional
+from typing import Any, Iterator, List, Literal, Optional
 
 import uvicorn
 import yaml
-from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi import Body, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import AnyUrl, BaseModel, Field
@@ -22,7 +27,11 @@ from starlette_wtf import CSRFProtectMiddleware, csrf_protect
 
 import forms
 import maptomethod
+import metrics
+import profiling
 import settings
+import suggest
+import workspace
 
 setting = settings.Setting()
 
@@ -70,7 +79,10 @@ middleware = [
     Middleware(
         uvicorn.middleware.proxy_headers.ProxyHeadersMiddleware, trusted_hosts="*"
     ),
+    Middleware(metrics.RequestMetricsMiddleware),
 ]
+if profiling.PROFILING_ENABLED:
+    middleware.append(Middleware(profiling.ProfilingMiddleware))
 
 app = FastAPI(
     title=setting.name,
@@ -115,6 +127,18 @@ def get_flashed_messages(request: Request):
 
 templates.env.globals["get_flashed_messages"] = get_flashed_messages
 
+# server side storage of entities resolved for a mapping session
+workspaces = workspace.create_store(
+    os.environ.get("WORKSPACE_DB") or None,
+    ttl=float(os.environ.get("WORKSPACE_TTL", 3600)),
+    max_entries=int(os.environ.get("WORKSPACE_MAX_ENTRIES", 1000)),
+)
+
+
+def get_workspace(request: Request) -> Optional[dict]:
+    workspace_id = request.session.get("workspace")
+    return workspaces.get(workspace_id) if workspace_id else None
+
 
 @app.get("/", response_class=HTMLResponse, include_in_schema=False)
 async def index(request: Request):
@@ -186,7 +210,7 @@ async def create_mapper(request: Request):
         request.session["mapping_object_types"] = mapping_object_types
 
         try:
-            mapper = maptomethod.Mapper(
+            mapper = await maptomethod.acreate_mapper(
                 data_url=data_url,
                 template_url=template_url,
                 use_template_rowwise=request.session["use_template_rowwise"],
@@ -199,9 +223,26 @@ async def create_mapper(request: Request):
                 ],
                 authorization=authorization,
             )
-            # Store subjects and objects in session for later use in /map
-            request.session["subjects"] = mapper.subjects
-            request.session["objects"] = mapper.objects
+            iterators = await maptomethod.run_in_executor(
+                maptomethod.discover_iterators, data_url, mapper.subjects, authorization
+            )
+            # Store resolved entities server side for later use in /map
+            workspace_id = request.session.get("workspace") or workspace.new_workspace_id()
+            workspaces.put(
+                workspace_id,
+                {
+                    "data_url": data_url,
+                    "template_url": template_url,
+                    "mapping_subject_types": mapping_subject_types,
+                    "mapping_object_types": mapping_object_types,
+                    "subjects": mapper.subjects,
+                    "objects": mapper.objects,
+                    "base_ns_subjects": str(mapper.base_ns_subjects),
+                    "base_ns_objects": str(mapper.base_ns_objects),
+                    "iterators": iterators,
+                },
+            )
+            request.session["workspace"] = workspace_id
             flash(request, str(mapper), "info")
             # flash(request, str(mapper.subjects), "info")
         except Exception as err:
@@ -271,18 +312,32 @@ async def map(request: Request):
     mapping_predicate_uri = request.session.get("mapping_predicate_uri", None)
     mapping_object_types = request.session.get("mapping_object_types", [])
     
-    # Re-query entities to ensure we have complete data (including "property" field)
-    # instead of relying on potentially incomplete session storage
-    subjects, _ = maptomethod.query_entities(
-        data_url,
-        [URIRef(uri) for uri in mapping_subject_types],
-        authorization
-    )
-    objects, _ = maptomethod.query_entities(
-        template_url,
-        [URIRef(uri) for uri in mapping_object_types],
-        authorization
-    )
+    # Use the entities resolved by /create_mapper, re-query only if the
+    # workspace expired or belongs to other documents
+    mapping_workspace = get_workspace(request)
+    if mapping_workspace and all(
+        mapping_workspace[key] == request.session.get(key)
+        for key in ["data_url", "template_url", "mapping_subject_types", "mapping_object_types"]
+    ):
+        subjects = mapping_workspace["subjects"]
+        objects = mapping_workspace["objects"]
+        base_ns_subjects = mapping_workspace["base_ns_subjects"]
+        base_ns_objects = mapping_workspace["base_ns_objects"]
+        iterators = mapping_workspace["iterators"]
+    else:
+        (subjects, base_ns_subjects), (objects, base_ns_objects) = await asyncio.gather(
+            maptomethod.aquery_entities(
+                data_url,
+                [URIRef(uri) for uri in mapping_subject_types],
+                authorization
+            ),
+            maptomethod.aquery_entities(
+                template_url,
+                [URIRef(uri) for uri in mapping_object_types],
+                authorization
+            ),
+        )
+        iterators = None
     
     # Create form and populate with session data
     start_form = forms.StartForm(
@@ -303,8 +358,8 @@ async def map(request: Request):
     logging.info("Creating mapping file for mapping list: {}".format(maplist))
     logging.info("Session mapping_subject_types: {}".format(mapping_subject_types))
     logging.info("Session mapping_object_types: {}".format(mapping_object_types))
-    logging.info("Re-queried subjects: {}".format(subjects))
-    logging.info("Re-queried objects: {}".format(objects))
+    logging.info("Subjects: {}".format(subjects))
+    logging.info("Objects: {}".format(objects))
     request.session["maplist"] = maplist
     with maptomethod.Mapper(
         data_url=data_url,
@@ -321,8 +376,11 @@ async def map(request: Request):
         subjects=subjects,
         objects=objects,
         authorization=authorization,
+        base_ns_subjects=base_ns_subjects,
+        base_ns_objects=base_ns_objects,
+        iterators=iterators,
     ) as mapper:
-        result = mapper.to_pretty_yaml()
+        result = await maptomethod.run_in_executor(mapper.to_pretty_yaml)
         filename = result["filename"]
         result_string = result["filedata"]
         # print(type(result_string))
@@ -366,7 +424,7 @@ class QueryRequest(BaseModel):
 
 
 @app.get("/api/types")
-def get_types(
+async def get_types(
     url: str = "https://github.com/Mat-O-Lab/CSVToCSVW/raw/main/examples/example-metadata.json",
     req: Request = None
 ):
@@ -380,23 +438,41 @@ def get_types(
     """
     authorization = req.headers.get("Authorization", None) if req else None
     try:
-        types = maptomethod.get_all_types(url, authorization)
+        types = await maptomethod.aget_all_types(url, authorization)
         return types
+    except HTTPException:
+        raise
     except Exception as err:
         raise HTTPException(status_code=500, detail=str(err))
 
 
 @app.get("/api/entities")
-def query_entities(
+async def query_entities(
     url: str = "https://github.com/Mat-O-Lab/CSVToCSVW/raw/main/examples/example-metadata.json",
     types: str = "http://www.w3.org/ns/oa#Annotation,http://www.w3.org/ns/csvw#Column",
+    subclasses: bool = False,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    entity_type: Optional[str] = Query(None, alias="type"),
+    prefix: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
     req: Request = None
 ):
     """Get entities of specified types from a semantic document.
+
+    Without limit, cursor, type, prefix or format all entities are returned in one
+    dict. Otherwise the entities are served from a cached index of the document,
+    sorted by name and paginated with the returned next_cursor.
     
     Args:
         url: URL to the semantic document (defaults to example data file)
         types: Comma-separated list of type URIs (defaults to Annotation and Column)
+        subclasses: Also return entities typed with subclasses of the types (defaults to False)
+        limit: Maximum number of entities to return (defaults to all)
+        cursor: next_cursor of the previous page to continue after
+        type: Only return entities of this type URI
+        prefix: Only return entities whose label starts with this text, case-insensitive
+        format: json, or ndjson to stream one entity per line with the next cursor in the X-Next-Cursor header
     
     Returns:
         JSON dict of entities with their metadata
@@ -404,8 +480,106 @@ def query_entities(
     authorization = req.headers.get("Authorization", None) if req else None
     # Parse comma-separated types and convert to URIRef objects
     type_list = [URIRef(uri.strip()) for uri in types.split(",") if uri.strip()]
-    entities, base_ns = maptomethod.query_entities(url, type_list, authorization)
-    return {"entities": entities, "base_namespace": base_ns}
+    paginated = (limit, cursor, entity_type, prefix) != (None,) * 4
+    if not paginated and format == "json":
+        entities, base_ns = await maptomethod.aquery_entities(
+            url, type_list, authorization, include_subclasses=subclasses
+        )
+        return {"entities": entities, "base_namespace": base_ns}
+    index = await maptomethod.aget_entity_index(
+        url, type_list, authorization, include_subclasses=subclasses
+    )
+    try:
+        items, next_cursor, total = index.page(cursor, limit, entity_type, prefix)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    if format == "ndjson":
+        headers = {"X-Total-Count": str(total), "X-Base-Namespace": str(index.base_namespace)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return StreamingResponse(
+            (json.dumps(dict(entity, name=name)) + "\n" for name, entity in items),
+            media_type="application/x-ndjson",
+            headers=headers,
+        )
+    return {
+        "entities": dict(items),
+        "base_namespace": index.base_namespace,
+        "next_cursor": next_cursor,
+        "total": total,
+    }
+
+
+class InspectRequest(BaseModel):
+    data_url: AnyUrl = Field(
+        "", title="Datas Graph Url", description="Url to data metadata to inspect."
+    )
+    template_url: AnyUrl = Field(
+        "", title="Template Graph Url", description="Url to knowledge graph to inspect."
+    )
+    data_types: List = Field(
+        [],
+        title="Data Subject Types",
+        description="List of entity types to return entities of in data.",
+    )
+    template_types: List = Field(
+        [],
+        title="Template Object Types",
+        description="List of entity types to return entities of in template graph.",
+    )
+    subclasses: Optional[bool] = Field(
+        False,
+        title="Include Subclasses",
+        description="If to also return entities typed with subclasses of the given types.",
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "data_url": "https://github.com/Mat-O-Lab/CSVToCSVW/raw/main/examples/example-metadata.json",
+                "template_url": "https://github.com/Mat-O-Lab/MSEO/raw/main/methods/DIN_EN_ISO_527-3.drawio.ttl",
+                "data_types": [
+                    maptomethod.OA.Annotation,
+                    maptomethod.CSVW.Column,
+                ],
+                "template_types": [
+                    maptomethod.InformtionContentEntity,
+                    maptomethod.TemporalRegionClass,
+                ],
+            },
+        }
+
+
+@app.post("/api/inspect")
+async def inspect(request: InspectRequest, req: Request):
+    """Get types, entities and base namespace of data and template document in one call.
+
+    Each document is fetched and parsed once, both concurrently.
+
+    Returns:
+        JSON dict with keys data and template, each with types, entities and base_namespace
+    """
+    authorization = req.headers.get("Authorization", None)
+    try:
+        data, template = await asyncio.gather(
+            maptomethod.ainspect_document(
+                str(request.data_url),
+                [URIRef(str(uri)) for uri in request.data_types],
+                authorization,
+                include_subclasses=request.subclasses,
+            ),
+            maptomethod.ainspect_document(
+                str(request.template_url),
+                [URIRef(str(uri)) for uri in request.template_types],
+                authorization,
+                include_subclasses=request.subclasses,
+            ),
+        )
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+    return {"data": data, "template": template}
 
 
 class MappingRequest(BaseModel):
@@ -440,6 +614,11 @@ class MappingRequest(BaseModel):
         title="Map Dict",
         description="Dict of with key as individual name of objects in knowledge graph and ids of indivuals in data metadata as values to create mapping rules for.",
     )
+    format: Literal["yaml", "json"] = Field(
+        "yaml",
+        title="Output Format",
+        description="Serialization of the YARRRML mapping, yaml or json.",
+    )
 
     class Config:
         json_schema_extra = {
@@ -467,6 +646,26 @@ class YAMLResponse(StreamingResponse):
     media_type = "application/x-yaml"
 
 
+MAPPING_MEDIA_TYPES = {"yaml": "application/x-yaml", "json": "application/json"}
+
+
+def start_stream(chunks: Iterator[str]) -> Iterator[bytes]:
+    """Create the first chunk of a streamed response before it is returned.
+
+    Once StreamingResponse sent its status line, errors can only abort the
+    transfer, so everything failing when the stream starts is raised here.
+
+    Args:
+        chunks (Iterator[str]): Lazily created text chunks
+
+    Returns:
+        Iterator[bytes]: The encoded chunks
+    """
+    chunks = iter(chunks)
+    first = next(chunks, "")
+    return itertools.chain([first.encode()], (chunk.encode() for chunk in chunks))
+
+
 @app.post("/api/mapping", response_class=YAMLResponse)
 def mapping(request: MappingRequest, req: Request) -> StreamingResponse:
     authorization = req.headers.get("Authorization", None)
@@ -487,19 +686,439 @@ def mapping(request: MappingRequest, req: Request) -> StreamingResponse:
             ],
             maplist=request.map.items(),
             authorization=authorization,
-        ).to_pretty_yaml()
+        ).iter_pretty_yaml(request.format)
+        # rules are created and serialized one by one while the response is sent
+        data_bytes = start_stream(result["filedata"])
+    except HTTPException:
+        raise
     except Exception as err:
         raise HTTPException(status_code=500, detail=str(err))
-    data_bytes = BytesIO(result["filedata"].encode())
     filename = result["filename"]
     headers = {
         "Content-Disposition": "attachment; filename={}".format(filename),
         "Access-Control-Expose-Headers": "Content-Disposition",
     }
-    media_type = "application/x-yaml"
+    media_type = MAPPING_MEDIA_TYPES[request.format]
     return StreamingResponse(content=data_bytes, media_type=media_type, headers=headers)
 
 
+class PatchMappingRequest(BaseModel):
+    mapping: str = Field(
+        title="Mapping",
+        description="YARRRML mapping previously returned by /api/mapping or /api/mapping/patch.",
+    )
+    map: dict = Field(
+        title="Map Delta",
+        description="Dict of changed assignments with individual names of objects in knowledge graph as key and ids of individuals in data metadata as value, null to remove the rule.",
+    )
+    data_url: Optional[AnyUrl] = Field(
+        None,
+        title="Datas Graph Url",
+        description="Url to data metadata to use, defaults to the access of the mapping sources.",
+    )
+    data_types: List = Field(
+        [maptomethod.OA.Annotation, maptomethod.CSVW.Column],
+        title="Data Subject Types",
+        description="List of entity types to query for mapping partners in data.",
+    )
+    predicate: Optional[AnyUrl] = Field(
+        None,
+        title="predicate property",
+        description="Predicate Property to connect data to template entities, defaults to the one of the mapping.",
+    )
+    format: Literal["yaml", "json"] = Field(
+        "yaml",
+        title="Output Format",
+        description="Serialization of the patched YARRRML mapping, yaml or json.",
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "mapping": "prefixes: ...",
+                "map": {
+                    "StrainMeasurementInformation": "table-1-Dehnung",
+                    "SpecimenName": None,
+                },
+            },
+        }
+
+
+@app.post("/api/mapping/patch", response_class=YAMLResponse)
+def patch_mapping(request: PatchMappingRequest, req: Request) -> StreamingResponse:
+    """Apply changed assignments to an existing mapping.
+
+    Only the rules of the changed template entities are rebuilt, prefixes,
+    sources and all other rules are taken over from the given mapping.
+
+    Returns:
+        YARRRML file of the patched mapping
+    """
+    authorization = req.headers.get("Authorization", None)
+    try:
+        mapping = maptomethod.load_mapping(request.mapping)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    try:
+        data_url = str(request.data_url) if request.data_url else None
+        if data_url is None:
+            data_url = next(
+                (source["access"] for source in (mapping.get("sources") or {}).values()),
+                None,
+            )
+        if data_url is None:
+            raise HTTPException(
+                status_code=400, detail="mapping has no sources, data_url is required"
+            )
+        subjects = maptomethod.get_entity_index(
+            data_url, [URIRef(str(uri)) for uri in request.data_types], authorization
+        ).entities
+        result = maptomethod.patch_mapping_output(
+            mapping,
+            request.map,
+            subjects,
+            URIRef(str(request.predicate)) if request.predicate else None,
+            data_url,
+            authorization,
+        )
+        filedata = start_stream(maptomethod.iter_dump_mapping(result["filedata"], request.format))
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+    filename = result["filename"]
+    if request.format == "json":
+        filename = filename.rsplit(".", 1)[0] + ".json"
+    headers = {
+        "Content-Disposition": "attachment; filename={}".format(filename),
+        "Access-Control-Expose-Headers": "Content-Disposition",
+    }
+    return StreamingResponse(
+        content=filedata,
+        media_type=MAPPING_MEDIA_TYPES[request.format],
+        headers=headers,
+    )
+
+
+class SuggestRequest(BaseModel):
+    data_url: AnyUrl = Field(
+        "", title="Datas Graph Url", description="Url to data metadata to use."
+    )
+    template_url: AnyUrl = Field(
+        "", title="Template Graph Url", description="Url to knowledge graph to use."
+    )
+    data_types: List = Field(
+        [maptomethod.OA.Annotation, maptomethod.CSVW.Column],
+        title="Data Subject Types",
+        description="List of entity types to query for mapping partners in data.",
+    )
+    template_types: List = Field(
+        [maptomethod.InformtionContentEntity, maptomethod.TemporalRegionClass],
+        title="Template Object Types",
+        description="List of entity types to query for mapping partners in template graph.",
+    )
+    limit: int = Field(
+        5, ge=1, title="Candidates", description="Maximum number of ranked candidates per template entity."
+    )
+    min_score: float = Field(
+        0.3,
+        ge=0.0,
+        le=1.0,
+        title="Minimum Score",
+        description="Smallest label similarity of a candidate, between 0 and 1.",
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "data_url": "https://github.com/Mat-O-Lab/CSVToCSVW/raw/main/examples/example-metadata.json",
+                "template_url": "https://github.com/Mat-O-Lab/MSEO/raw/main/methods/DIN_EN_ISO_527-3.drawio.ttl",
+                "limit": 5,
+                "min_score": 0.3,
+            },
+        }
+
+
+@app.post("/api/mapping/suggest")
+async def suggest_mapping(request: SuggestRequest, req: Request):
+    """Suggest pairs of template and data entities by the similarity of their labels.
+
+    Returns:
+        JSON dict with maplist (pairs of template entity and data subject), map (the
+        maplist as dict, usable as map of /api/mapping) and candidates (ranked data
+        subjects with score per template entity)
+    """
+    authorization = req.headers.get("Authorization", None)
+    try:
+        subjects, objects = await asyncio.gather(
+            maptomethod.aget_entity_index(
+                str(request.data_url),
+                [URIRef(str(uri)) for uri in request.data_types],
+                authorization,
+            ),
+            maptomethod.aget_entity_index(
+                str(request.template_url),
+                [URIRef(str(uri)) for uri in request.template_types],
+                authorization,
+            ),
+        )
+        result = await maptomethod.run_in_executor(
+            suggest.suggest,
+            objects.entities,
+            subjects.entities,
+            request.limit,
+            request.min_score,
+        )
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+    result["map"] = dict(result["maplist"])
+    return result
+
+
+class BatchJob(BaseModel):
+    data_url: AnyUrl = Field(
+        "", title="Datas Graph Url", description="Url to data metadata to use."
+    )
+    map: dict = Field(
+        title="Map Dict",
+        description="Dict of with key as individual name of objects in knowledge graph and ids of indivuals in data metadata as values to create mapping rules for.",
+    )
+
+
+class BatchMappingRequest(BaseModel):
+    template_url: AnyUrl = Field(
+        "", title="Template Graph Url", description="Url to knowledge graph shared by all jobs."
+    )
+    use_template_rowwise: Optional[bool] = Field(
+        False,
+        title="Use Template Rowwise",
+        description="If to duplicate the Template Graph for each row.",
+        omit_default=True,
+    )
+    data_types: List = Field(
+        [maptomethod.OA.Annotation, maptomethod.CSVW.Column],
+        title="Data Subject Types",
+        description="List of entity types to query for mapping partners in data.",
+    )
+    predicate: AnyUrl = Field(
+        maptomethod.ContentToBearingRelation,
+        title="predicate property",
+        description="Predicate Property to connect data to template entities.",
+    )
+    template_types: List = Field(
+        [maptomethod.InformtionContentEntity, maptomethod.TemporalRegionClass],
+        title="Template Object Types",
+        description="List of entity types to query for mapping partners in template graph.",
+    )
+    jobs: List[BatchJob] = Field(
+        title="Jobs",
+        description="Data documents with their map dicts to create mappings for.",
+    )
+    format: Literal["zip", "yaml"] = Field(
+        "zip",
+        title="Output Format",
+        description="zip archive with one mapping file per job (and errors.json if any job failed) or a multi-document yaml stream.",
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "template_url": "https://github.com/Mat-O-Lab/MSEO/raw/main/methods/DIN_EN_ISO_527-3.drawio.ttl",
+                "jobs": [
+                    {
+                        "data_url": "https://github.com/Mat-O-Lab/CSVToCSVW/raw/main/examples/example-metadata.json",
+                        "map": {
+                            "SpecimenName": "AktuelleProbe0",
+                            "StrainMeasurementInformation": "table-1-Dehnung",
+                        },
+                    },
+                ],
+                "format": "zip",
+            },
+        }
+
+
+@app.post("/api/mapping/batch")
+def batch_mapping(request: BatchMappingRequest, req: Request) -> StreamingResponse:
+    """Create mappings for many data documents against one template.
+
+    The template is fetched and queried once, jobs run on a bounded worker pool.
+    Failed jobs are reported per item instead of failing the whole batch.
+    """
+    authorization = req.headers.get("Authorization", None)
+    try:
+        results = maptomethod.Mapper.batch(
+            str(request.template_url),
+            [(str(job.data_url), list(job.map.items())) for job in request.jobs],
+            use_template_rowwise=request.use_template_rowwise,
+            template_object_types=[
+                URIRef(str(uri)) for uri in request.template_types
+            ],
+            mapping_predicate_uri=URIRef(str(request.predicate)),
+            data_subject_types=[
+                URIRef(str(uri)) for uri in request.data_types
+            ],
+            authorization=authorization,
+        )
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=str(err))
+    if request.format == "yaml":
+        documents = []
+        for result in results:
+            if "error" in result:
+                document = yaml.safe_dump(
+                    {"data_url": result["data_url"], "error": result["error"]},
+                    allow_unicode=True,
+                )
+            else:
+                document = "# {}\n{}".format(result["filename"], result["filedata"])
+            documents.append("---\n" + document)
+        headers = {
+            "Content-Disposition": "attachment; filename=mappings.yaml",
+            "Access-Control-Expose-Headers": "Content-Disposition",
+        }
+        return StreamingResponse(
+            content=iter(document.encode() for document in documents),
+            media_type="application/x-yaml",
+            headers=headers,
+        )
+    archive = BytesIO()
+    errors = []
+    filenames = set()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for index, result in enumerate(results):
+            if "error" in result:
+                errors.append(
+                    {"job": index, "data_url": result["data_url"], "error": result["error"]}
+                )
+                continue
+            filename = result["filename"]
+            if filename in filenames:
+                filename = "{}-{}".format(index, filename)
+            filenames.add(filename)
+            zip_file.writestr(filename, result["filedata"])
+        if errors:
+            zip_file.writestr("errors.json", json.dumps(errors, indent=2))
+    archive.seek(0)
+    headers = {
+        "Content-Disposition": "attachment; filename=mappings.zip",
+        "Access-Control-Expose-Headers": "Content-Disposition",
+    }
+    return StreamingResponse(content=archive, media_type="application/zip", headers=headers)
+
+
+@app.get("/api/cache")
+def cache_stats():
+    """Get hit rates and sizes of the document fetch, parsed graph and shared caches,
+    the connection reuse of the http pool and the number of coalesced concurrent calls.
+
+    Returns:
+        JSON dict of cache counters and sizes
+    """
+    result = {
+        "fetch": maptomethod.fetch_cache.stats(),
+        "graph": maptomethod.graph_cache.stats(),
+        "entity_index": maptomethod.entity_index_cache.stats(),
+        "http": maptomethod.http_pool_stats(),
+        "coalescing": {
+            name: flight.stats() for name, flight in maptomethod.flights.items()
+        },
+    }
+    if maptomethod.shared_cache is not None:
+        result["shared"] = maptomethod.shared_cache.stats()
+    return result
+
+
+def check_cache_admin_token(req: Request) -> None:
+    if not maptomethod.CACHE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="purging the caches is disabled")
+    token = req.headers.get(maptomethod.CACHE_ADMIN_HEADER)
+    if not token or not hmac.compare_digest(
+        token.encode(), maptomethod.CACHE_ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+
+
+@app.delete("/api/cache")
+def cache_invalidate(req: Request, url: Optional[str] = None):
+    """Purge entries from the document fetch, parsed graph, entity index and shared caches.
+
+    Parsed graphs, entity indexes and shared results are keyed by content, so they are only purged if no url is given.
+    Requires CACHE_ADMIN_TOKEN to be configured and sent in the X-Admin-Token header.
+
+    Args:
+        url: Only purge entries of this url (defaults to purging all entries)
+
+    Returns:
+        JSON dict with the number of purged entries
+    """
+    check_cache_admin_token(req)
+    result = {"fetch": {"removed": maptomethod.fetch_cache.invalidate(url)}}
+    if url is None:
+        result["graph"] = {"removed": maptomethod.graph_cache.clear()}
+        result["entity_index"] = {"removed": maptomethod.entity_index_cache.clear()}
+        if maptomethod.shared_cache is not None:
+            result["shared"] = {"removed": maptomethod.shared_cache.clear_results()}
+    return result
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Get stage latencies, document sizes, in flight requests and cache counters in the Prometheus text format.
+
+    Returns:
+        Prometheus text exposition of all metrics
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def check_profiling_token(req: Request) -> None:
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="profiling is disabled")
+    if not profiling.authorized(req.headers.get(profiling.PROFILING_HEADER)):
+        raise HTTPException(status_code=403, detail="invalid profiling token")
+
+
+@app.get("/api/profiles")
+def list_profiles(req: Request):
+    """List the profiles of recent profiled requests, newest first.
+
+    Requests to /api/mapping, /api/entities and /create_mapper are profiled if
+    profiling is enabled and they send the X-Profile-Token header.
+
+    Returns:
+        JSON list of profile summaries with stage durations
+    """
+    check_profiling_token(req)
+    return profiling.store.list()
+
+
+@app.get("/api/profiles/{profile_id}")
+def get_profile(
+    profile_id: str, req: Request, format: Literal["folded", "json"] = "folded"
+):
+    """Get the profile of a request by the id returned in its X-Profile-Id header.
+
+    Args:
+        profile_id: Id of the profile
+        format: folded for collapsed stacks as read by flamegraph.pl and speedscope, json for a summary with the stacks
+
+    Returns:
+        Collapsed stacks, one line per stack with its sample count, or JSON dict
+    """
+    check_profiling_token(req)
+    entry = profiling.store.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="no profile {}".format(profile_id))
+    if format == "json":
+        return dict(entry["summary"], collapsed=entry["collapsed"])
+    return PlainTextResponse(entry["collapsed"])
+
+
 @app.get("/info", response_model=settings.Setting)
 async def info() -> dict:
     return setting
@@ -0,0 +1,108 @@
+"""Measure the peak RSS of downloading a large document.
+
+Usage: python benchmarks/download_memory.py [--megabytes N] [--output FILE]
+
+A generated metadata document of about --megabytes is served from a local
+http server. Every mode runs in a fresh interpreter, reporting the growth of
+its peak resident set size (VmHWM, so Linux only) over the state after importing:
+
+    buffered   the body read at once with requests, as Response.content does
+    streamed   maptomethod.fetch_url, reading the body in chunks
+    parsed     maptomethod.query_entities, download and entity extraction
+    rejected   fetch_url with FETCH_MAX_BYTES below the document size
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generators
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+import requests
+import maptomethod
+from fastapi import HTTPException
+
+def peak():
+    # unlike ru_maxrss, not inherited from the parent process
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+
+url, mode = sys.argv[1], sys.argv[2]
+before = peak()
+start = time.perf_counter()
+status = 200
+size = 0
+try:
+    if mode == "buffered":
+        size = len(requests.get(url, stream=True).content)
+    elif mode == "parsed":
+        entities, _ = maptomethod.query_entities(url, [maptomethod.CSVW.Column])
+        size = len(entities)
+    else:
+        size = len(maptomethod.fetch_url(url, "data-metadata.json"))
+except HTTPException as err:
+    status = err.status_code
+print(json.dumps({
+    "status": status,
+    "size": size,
+    "seconds": time.perf_counter() - start,
+    "peak_rss_growth_bytes": peak() - before,
+}))
+"""
+
+
+def run(url, mode, env):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, url, mode],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--megabytes", type=int, default=50)
+    parser.add_argument("--output", help="write the json results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # a column takes about 100 bytes of json
+        data = json.dumps(generators.csvw_metadata(args.megabytes * 10000)).encode()
+        with open(os.path.join(tmp_dir, "data-metadata.json"), "wb") as f:
+            f.write(data)
+        del data
+        env = dict(os.environ, PARSE_MAX_BYTES="0", FETCH_MAX_BYTES="0")
+        with generators.serve(tmp_dir) as base_url:
+            url = base_url + "data-metadata.json"
+            document_bytes = os.path.getsize(os.path.join(tmp_dir, "data-metadata.json"))
+            for mode in ("buffered", "streamed", "parsed"):
+                results[mode] = run(url, mode, env)
+            results["rejected"] = run(
+                url, "rejected", dict(env, FETCH_MAX_BYTES=str(document_bytes // 2))
+            )
+
+    report = json.dumps({"document_bytes": document_bytes, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
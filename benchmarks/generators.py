@@ -0,0 +1,140 @@
+"""Synthetic documents for the benchmarks.
+
+csvw_metadata creates CSVToCSVW style JSON-LD metadata, template_graph a turtle
+template with individuals of the default template object types. serve serves
+a directory on a local http server, so fetching can be benchmarked offline.
+"""
+import contextlib
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+CONTEXT = {
+    "@vocab": "http://www.w3.org/ns/csvw#",
+    "csvw": "http://www.w3.org/ns/csvw#",
+    "oa": "http://www.w3.org/ns/oa#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "label": "rdfs:label",
+    "@base": "http://example.org/data/",
+}
+
+ICE = "https://spec.industrialontologies.org/ontology/core/Core/InformationContentEntity"
+TEMPORAL_REGION = "http://purl.obolibrary.org/obo/BFO_0000008"
+
+
+def csvw_metadata(columns: int, annotations: int = 10, tables: int = 1) -> dict:
+    """CSVToCSVW style metadata with annotations and nested tables of columns.
+
+    Args:
+        columns (int): Columns per table
+        annotations (int, optional): Header annotations. Defaults to 10.
+        tables (int, optional): Number of tables. Defaults to 1.
+
+    Returns:
+        dict: JSON-LD document
+    """
+    return {
+        "@context": CONTEXT,
+        "@id": "http://example.org/data/",
+        "notes": [
+            {
+                "@id": "annotation{}".format(i),
+                "@type": "oa:Annotation",
+                "label": "annotation {}".format(i),
+                "value": str(i),
+            }
+            for i in range(annotations)
+        ],
+        "tables": [
+            {
+                "@id": "table-{}".format(t),
+                "@type": "Table",
+                "url": "data-{}.csv".format(t),
+                "tableSchema": {
+                    "@type": "Schema",
+                    "columns": [
+                        {
+                            "@id": "table-{}-column{}".format(t, i),
+                            "@type": "Column",
+                            "name": "column{}".format(i),
+                            "titles": {"en": "Column {}".format(i)},
+                        }
+                        for i in range(columns)
+                    ],
+                },
+            }
+            for t in range(tables)
+        ],
+    }
+
+
+def template_graph(individuals: int, temporal_share: float = 0.1) -> str:
+    """Turtle template with information content entities and temporal regions.
+
+    Args:
+        individuals (int): Number of individuals
+        temporal_share (float, optional): Share of temporal regions among them. Defaults to 0.1.
+
+    Returns:
+        str: Turtle document
+    """
+    temporal = int(individuals * temporal_share)
+    lines = [
+        "@prefix : <http://example.org/template/> .",
+        "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
+    ]
+    for i in range(individuals):
+        if i < temporal:
+            lines.append(":TimeInterval{} a <{}> .".format(i, TEMPORAL_REGION))
+        else:
+            lines.append(
+                ':Entity{} a <{}> ; rdfs:label "Entity {}" .'.format(i, ICE, i)
+            )
+    return "\n".join(lines) + "\n"
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, delay: float = 0.0, **kwargs):
+        self.delay = delay
+        super().__init__(*args, **kwargs)
+
+    def send_head(self):
+        # a slow upstream, the response starts after delay seconds
+        time.sleep(self.delay)
+        return super().send_head()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # clients closing early, e.g. after rejecting a large document
+        pass
+
+
+@contextlib.contextmanager
+def serve(directory: str, delay: float = 0.0) -> Iterator[str]:
+    """Serve directory on localhost while the context is open.
+
+    Args:
+        directory (str): Directory to serve
+        delay (float, optional): Seconds to wait before answering each request. Defaults to 0.
+
+    Yields:
+        str: Base url of the served directory
+    """
+    handler = functools.partial(
+        _QuietHandler, directory=os.path.abspath(directory), delay=delay
+    )
+    server = _QuietServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}/".format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
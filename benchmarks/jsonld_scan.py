@@ -0,0 +1,74 @@
+"""Compare entity extraction from JSON-LD metadata by the scanner with the rdflib parser.
+
+Usage: python benchmarks/jsonld_scan.py [--columns N] [--repeat N]
+
+Prints a json document with the timings in seconds and peak traced memory in
+bytes of both paths on synthetic CSVW metadata. That both return identical
+results is tested in tests/test_jsonld_scan.py.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import maptomethod
+from benchmarks.generators import csvw_metadata
+
+CLASSES = [maptomethod.OA.Annotation, maptomethod.CSVW.Column]
+
+
+def analyze(data, fast):
+    maptomethod.JSONLD_FAST_PATH = fast
+    maptomethod.graph_cache.clear()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return maptomethod.analyze_data(
+            data, "json-ld", "http://example.org/meta.json", set(CLASSES)
+        )
+
+
+def measure(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--columns", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = json.dumps(csvw_metadata(args.columns)).encode()
+    scan_time, scan_peak, _ = measure(args.repeat, lambda: analyze(data, True))
+    parse_time, parse_peak, parsed = measure(args.repeat, lambda: analyze(data, False))
+    print(
+        json.dumps(
+            {
+                "columns": args.columns,
+                "document_bytes": len(data),
+                "entities": len(parsed["entities"]),
+                "scan": scan_time,
+                "rdflib": parse_time,
+                "speedup": parse_time / scan_time if scan_time else None,
+                "scan_peak_bytes": scan_peak,
+                "rdflib_peak_bytes": parse_peak,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Compare serializing generated mappings with the python and libyaml emitters and as json.
+
+Usage: python benchmarks/mapping_dump.py [--sizes 10 100 ...] [--repeat N]
+
+Prints a json document with the best timings in seconds per mapping size,
+whether both yaml emitters produced identical output, and the time to the
+first chunk and peak traced memory of chunked streaming compared to a full dump.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml import dump
+
+import maptomethod
+
+
+def synthetic_mapping(rules, lazy=False):
+    subjects = {
+        "column{}".format(i): {"property": "name", "text": "Spalte {} (mm²)".format(i)}
+        for i in range(rules)
+    }
+    maplist = [("Entity{}".format(i), "column{}".format(i)) for i in range(rules)]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return maptomethod.get_mapping_output(
+            "https://example.org/data/example-metadata.json",
+            False,
+            "https://example.org/data/",
+            "https://example.org/template/",
+            maplist,
+            subjects,
+            maptomethod.ContentToBearingRelation,
+            iterators={"name": ("$.tables[*].tableSchema.columns[*]", "columns")},
+            lazy=lazy,
+        )["filedata"]
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def traced_peak(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def stream(rules):
+    """Seconds to the first chunk and to the last, and the streamed text."""
+    start = time.perf_counter()
+    chunks = maptomethod.iter_dump_mapping(synthetic_mapping(rules, lazy=True))
+    parts = [next(chunks)]
+    first = time.perf_counter() - start
+    for chunk in chunks:
+        parts.append(chunk)
+    return first, time.perf_counter() - start, "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        mapping = synthetic_mapping(size)
+        python_time, python_yaml = best_of(
+            args.repeat,
+            lambda: dump(mapping, Dumper=maptomethod.Dumper, allow_unicode=True),
+        )
+        yaml_time, fast_yaml = best_of(
+            args.repeat, lambda: maptomethod.dump_mapping(mapping, "yaml")
+        )
+        json_time, _ = best_of(args.repeat, lambda: maptomethod.dump_mapping(mapping, "json"))
+        first_chunk, stream_time, streamed = stream(size)
+        full_peak = traced_peak(
+            lambda: maptomethod.dump_mapping(synthetic_mapping(size)).encode()
+        )
+        # consume chunk by chunk like the response does
+        stream_peak = traced_peak(
+            lambda: [
+                len(chunk.encode())
+                for chunk in maptomethod.iter_dump_mapping(synthetic_mapping(size, lazy=True))
+            ]
+        )
+        results.append(
+            {
+                "rules": size,
+                "yaml_bytes": len(python_yaml.encode()),
+                "python_yaml": python_time,
+                "mapping_yaml": yaml_time,
+                "json": json_time,
+                "identical": python_yaml == fast_yaml,
+                "stream_first_chunk": first_chunk,
+                "stream_total": stream_time,
+                "stream_identical": streamed == fast_yaml,
+                "full_dump_peak_bytes": full_peak,
+                "stream_peak_bytes": stream_peak,
+            }
+        )
+    print(
+        json.dumps(
+            {"emitter": maptomethod.MappingDumper.__name__, "results": results},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Time and memory profile every stage of creating a mapping on synthetic documents.
+
+Usage: python benchmarks/pipeline.py [--columns 100 1000 ...] [--annotations N]
+       [--tables N] [--individuals N] [--http] [--repeat N] [--output FILE]
+
+For every column count, CSVToCSVW style metadata and a template are generated
+into a temporary directory and read through file:// urls, or with --http from
+a local http server. Each stage runs with cold caches; the best time of
+--repeat runs and the peak traced memory of a separate run are reported as
+json, on stdout or into --output.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rdflib import URIRef
+
+import generators
+import maptomethod
+
+DATA_TYPES = [maptomethod.OA.Annotation, maptomethod.CSVW.Column]
+TEMPLATE_TYPES = [URIRef(generators.ICE), URIRef(generators.TEMPORAL_REGION)]
+
+
+def clear_caches():
+    maptomethod.fetch_cache.invalidate()
+    maptomethod.graph_cache.clear()
+    maptomethod.entity_index_cache.clear()
+
+
+def profile(repeat, func, warm=None):
+    """Best time of repeat cold runs and peak traced memory of func.
+
+    Args:
+        repeat (int): Number of timed runs
+        func (callable): Stage to run
+        warm (callable, optional): Run after clearing the caches, before each run of func, to prepare its input
+
+    Returns:
+        dict: Dict with seconds and peak_bytes
+    """
+    timings = []
+    for _ in range(repeat + 1):
+        clear_caches()
+        if warm:
+            warm()
+        tracing = len(timings) == repeat
+        if tracing:
+            tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if tracing:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            timings.append(elapsed)
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+
+def run_stages(data_url, template_url, repeat):
+    subjects, data_ns = maptomethod.query_entities(data_url, DATA_TYPES)
+    objects, template_ns = maptomethod.query_entities(template_url, TEMPLATE_TYPES)
+    maplist = list(zip(objects, subjects))
+    iterators = maptomethod.find_jsonpath_iterators(
+        maptomethod.load_json(data_url), ["label", "name"]
+    )
+
+    def fetch_data():
+        maptomethod.open_file(data_url)
+
+    def mapper():
+        return maptomethod.Mapper(
+            data_url,
+            template_url,
+            False,
+            subjects=subjects,
+            objects=objects,
+            maplist=maplist,
+            base_ns_subjects=data_ns,
+            base_ns_objects=template_ns,
+            iterators=iterators,
+        )
+
+    stages = {
+        "open_file": profile(repeat, fetch_data),
+        "query_entities": profile(
+            repeat, lambda: maptomethod.query_entities(data_url, DATA_TYPES), fetch_data
+        ),
+        "query_entities_template": profile(
+            repeat, lambda: maptomethod.query_entities(template_url, TEMPLATE_TYPES)
+        ),
+        "get_all_types": profile(
+            repeat, lambda: maptomethod.get_all_types(data_url), fetch_data
+        ),
+        "find_jsonpath_iterator": profile(
+            repeat,
+            lambda: maptomethod.find_jsonpath_iterator(data_url, "name"),
+            fetch_data,
+        ),
+        "get_mapping_output": profile(
+            repeat,
+            lambda: maptomethod.get_mapping_output(
+                data_url,
+                False,
+                data_ns,
+                template_ns,
+                maplist,
+                subjects,
+                maptomethod.ContentToBearingRelation,
+                iterators=iterators,
+            ),
+        ),
+        "to_pretty_yaml": profile(repeat, lambda: mapper().to_pretty_yaml()),
+    }
+    return {"subjects": len(subjects), "objects": len(objects), "rules": len(maplist), "stages": stages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--columns", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--annotations", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=1)
+    parser.add_argument("--individuals", type=int, default=1000)
+    parser.add_argument("--http", action="store_true", help="serve documents over local http")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the json results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.ExitStack() as stack:
+        if args.http:
+            base_url = stack.enter_context(generators.serve(tmp_dir))
+        else:
+            base_url = "file://" + tmp_dir + "/"
+        template_name = "template.ttl"
+        with open(os.path.join(tmp_dir, template_name), "w") as f:
+            f.write(generators.template_graph(args.individuals))
+        for columns in args.columns:
+            data_name = "data-{}-metadata.json".format(columns)
+            data = json.dumps(
+                generators.csvw_metadata(columns, args.annotations, args.tables)
+            ).encode()
+            with open(os.path.join(tmp_dir, data_name), "wb") as f:
+                f.write(data)
+            # the library prints query results, keep them out of the report
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = run_stages(base_url + data_name, base_url + template_name, args.repeat)
+            results.append(dict({"columns": columns, "document_bytes": len(data)}, **result))
+
+    report = json.dumps(
+        {
+            "config": {
+                "annotations": args.annotations,
+                "tables": args.tables,
+                "individuals": args.individuals,
+                "http": args.http,
+                "repeat": args.repeat,
+                "parse_backend": maptomethod.PARSE_BACKEND,
+                "jsonld_fast_path": maptomethod.JSONLD_FAST_PATH,
+                "yaml_emitter": maptomethod.MappingDumper.__name__,
+            },
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare cold parsing of an ontology source with loading its binary snapshot.
+
+Usage: python benchmarks/snapshot_load.py [ontology file] [--repeat N]
+
+Prints a json document with the best timings in seconds.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rdflib import Graph
+from rdflib.util import guess_format
+
+import snapshot
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("source", nargs="?", default="ontologies/iof.rdf")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    parse_time, graph = best_of(
+        args.repeat, lambda: Graph().parse(args.source, format=guess_format(args.source))
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "ontology.m2m")
+        write_time, _ = best_of(args.repeat, lambda: snapshot.write_snapshot(graph, path))
+
+        def open_snapshot():
+            snap = snapshot.Snapshot(path)
+            ids = sum(1 for _ in snap.term_ids())
+            snap.close()
+            return ids
+
+        open_time, _ = best_of(args.repeat, open_snapshot)
+        load_time, loaded = best_of(args.repeat, lambda: snapshot.load_snapshot(path))
+        snapshot_bytes = os.path.getsize(path)
+    print(
+        json.dumps(
+            {
+                "source": args.source,
+                "source_bytes": os.path.getsize(args.source),
+                "snapshot_bytes": snapshot_bytes,
+                "triples": len(graph),
+                "parse_source": parse_time,
+                "write_snapshot": write_time,
+                "scan_snapshot_ids": open_time,
+                "load_snapshot_graph": load_time,
+                "speedup": parse_time / load_time if load_time else None,
+                "complete": len(loaded) == len(graph),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
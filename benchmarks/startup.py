@@ -0,0 +1,98 @@
+"""Measure worker startup: importing the app and serving the first request.
+
+Usage: python benchmarks/startup.py [--runs N] [--columns N] [--output FILE]
+
+Every run starts a fresh interpreter, like a restarted uvicorn worker, which
+imports app, then sends a first /api/entities request for a generated local
+metadata document, and a second one for comparison. Runs are done with
+FAST_START enabled and disabled; the median of each measurement is reported
+as json, together with whether optional heavy modules were imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generators
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules only needed for downloads
+LAZY_MODULES = ["github", "requests", "urllib3"]
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+loaded = {{name: name in sys.modules for name in {lazy!r}}}
+modules = len(sys.modules)
+from fastapi.testclient import TestClient
+client = TestClient(app.app)
+timings = []
+for _ in range(2):
+    start = time.perf_counter()
+    response = client.get("/api/entities", params={{"url": {url!r}}})
+    timings.append(time.perf_counter() - start)
+    assert response.status_code == 200, response.text
+print(json.dumps({{
+    "import": imported,
+    "first_request": timings[0],
+    "second_request": timings[1],
+    "modules": modules,
+    "loaded": loaded,
+}}))
+"""
+
+
+def run(env, url):
+    # the app mounts ./static, so start where a worker would
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(url=url, lazy=LAZY_MODULES)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--columns", type=int, default=100)
+    parser.add_argument("--output", help="write the json results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "data-metadata.json")
+        with open(path, "w") as f:
+            json.dump(generators.csvw_metadata(args.columns), f)
+        for fast_start in ("True", "False"):
+            env = dict(os.environ, FAST_START=fast_start, PYTHONDONTWRITEBYTECODE="1")
+            runs = [run(env, "file://" + path) for _ in range(args.runs)]
+            results["fast_start" if fast_start == "True" else "default"] = {
+                key: statistics.median(result[key] for result in runs)
+                for key in ("import", "first_request", "second_request", "modules")
+            }
+            results["fast_start" if fast_start == "True" else "default"]["loaded"] = runs[0]["loaded"]
+
+    report = json.dumps(
+        {"config": {"runs": args.runs, "columns": args.columns}, "results": results},
+        indent=2,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Time suggesting a maplist for many template objects and data subjects.
+
+Usage: python benchmarks/suggest.py [--entities N] [--repeat N] [--output FILE]
+
+Labels are generated in two styles: domain, two to four words drawn from a
+small shared vocabulary of testing terms as in real metadata, so most labels
+share many grams; and diverse, words of random letters. The best time of
+--repeat runs of suggest.suggest with N objects and N subjects is reported as
+json, together with the number of suggested pairs.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import suggest
+
+VOCABULARY = (
+    "specimen sample test machine force load extension elongation strain stress "
+    "width thickness length diameter area cross section gauge initial final "
+    "maximum minimum mean upper lower yield tensile strength modulus elastic "
+    "temperature time rate speed crosshead displacement fracture break point "
+    "measured nominal actual value channel sensor cell grip distance offset "
+    "hardness depth indent energy impact charpy notch angle density mass volume"
+).split()
+
+
+def domain_labels(count: int, rng: random.Random) -> list:
+    return [
+        " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 4)))
+        + (" {}".format(rng.randint(1, 9)) if rng.random() < 0.3 else "")
+        for _ in range(count)
+    ]
+
+
+def diverse_labels(count: int, rng: random.Random) -> list:
+    return [
+        " ".join(
+            "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+            for _ in range(rng.randint(1, 3))
+        )
+        for _ in range(count)
+    ]
+
+
+def entities(prefix: str, labels: list) -> dict:
+    return {
+        "{}{}".format(prefix, i): {"uri": "http://example.org/{}{}".format(prefix, i), "property": "label", "text": label}
+        for i, label in enumerate(labels)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the json results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for style, labels in (("domain", domain_labels), ("diverse", diverse_labels)):
+        rng = random.Random(0)
+        objects = entities("object", labels(args.entities, rng))
+        subjects = entities("subject", labels(args.entities, rng))
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = suggest.suggest(objects, subjects)
+            timings.append(time.perf_counter() - start)
+        results[style] = {"seconds": min(timings), "pairs": len(result["maplist"])}
+
+    report = json.dumps({"config": {"entities": args.entities}, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
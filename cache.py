@@ -0,0 +1,717 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def content_hash(data: bytes) -> str:
+    """Hash used to address cached document bodies.
+
+    Args:
+        data (bytes): Raw document content
+
+    Returns:
+        str: Hex digest of the content
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def request_key(url: str, authorization: Optional[str] = None) -> str:
+    """Cache key of a request, separate for each Authorization header value.
+
+    The header itself is only hashed, so no credentials end up on disk.
+
+    Args:
+        url (str): Requested url
+        authorization (str, optional): Authorization Header value of the request
+
+    Returns:
+        str: Hex digest identifying url and authorization
+    """
+    auth_hash = content_hash((authorization or "").encode())
+    return content_hash("{}\0{}".format(url, auth_hash).encode())
+
+
+class FetchCache:
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entries: int,
+        ttl: float,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 0,
+        shared: Optional["SharedCache"] = None,
+    ):
+        """Content addressed cache for downloaded documents.
+
+        Entries map a request (url and authorization) to the hash of the body it
+        returned together with the validators (ETag, Last-Modified) needed for
+        conditional requests. Bodies are stored once per content hash, so urls
+        pointing at the same document share memory. The memory tier is evicted
+        least recently used first, bounded by total body bytes and entry count.
+        If disk_dir is set, entries and bodies are also written there and survive
+        restarts. If shared is set, they are also stored in the shared cache, so
+        other workers can serve them without downloading them again.
+
+        Args:
+            max_bytes (int): Maximum bytes of document bodies kept in memory
+            max_entries (int): Maximum number of requests kept in memory
+            ttl (float): Seconds an entry is served without revalidation
+            disk_dir (str, optional): Directory of the disk tier. Defaults to None, no disk tier.
+            disk_max_bytes (int, optional): Maximum bytes of bodies kept on disk, 0 for unbounded.
+            shared (SharedCache, optional): Cache shared with other workers, looked up after the disk tier. Defaults to None.
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._blobs = {}
+        self._blob_refs = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "evictions": 0,
+            "disk_hits": 0,
+            "shared_hits": 0,
+        }
+        if self.disk_dir:
+            os.makedirs(os.path.join(self.disk_dir, "blobs"), exist_ok=True)
+            os.makedirs(os.path.join(self.disk_dir, "entries"), exist_ok=True)
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Whether an entry can be served without asking the origin server."""
+        return time.time() - entry["validated"] < self.ttl
+
+    def get(self, url: str, authorization: Optional[str] = None) -> Optional[dict]:
+        """Look up the cached entry of a request, memory first, then disk, then the shared cache.
+
+        Args:
+            url (str): Requested url
+            authorization (str, optional): Authorization Header value of the request
+
+        Returns:
+            dict: Entry with keys url, filename, hash, etag, last_modified, validated and data, or None
+        """
+        key = request_key(url, authorization)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                return dict(entry, data=self._blobs[entry["hash"]])
+        entry = self._read_disk(key)
+        if entry:
+            self.count("disk_hits")
+            data = entry.pop("data")
+            if len(data) <= self.max_bytes:
+                with self._lock:
+                    self._store(key, entry, data)
+            return dict(entry, data=data)
+        entry = self.shared.get_request(key) if self.shared else None
+        if entry:
+            self.count("shared_hits")
+            data = entry.pop("data")
+            if len(data) <= self.max_bytes:
+                with self._lock:
+                    self._store(key, entry, data)
+            return dict(entry, data=data)
+        return None
+
+    def put(
+        self,
+        url: str,
+        authorization: Optional[str],
+        data: bytes,
+        filename: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Store the body of a successful response.
+
+        Args:
+            url (str): Requested url
+            authorization (str, optional): Authorization Header value of the request
+            data (bytes): Response body
+            filename (str): Filename derived from the url
+            etag (str, optional): ETag header of the response
+            last_modified (str, optional): Last-Modified header of the response
+        """
+        key = request_key(url, authorization)
+        entry = {
+            "url": url,
+            "filename": filename,
+            "hash": content_hash(data),
+            "etag": etag,
+            "last_modified": last_modified,
+            "validated": time.time(),
+        }
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                self._store(key, entry, data)
+        self._write_disk(key, entry, data)
+        if self.shared:
+            self.shared.put_request(key, entry, data)
+
+    def touch(self, url: str, authorization: Optional[str] = None) -> None:
+        """Mark an entry as validated now, after the origin answered 304 Not Modified."""
+        key = request_key(url, authorization)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry["validated"] = now
+        if self.disk_dir:
+            entry = self._read_disk(key, with_data=False)
+            if entry:
+                entry["validated"] = now
+                self._write_entry(key, entry)
+        if self.shared:
+            self.shared.touch_request(key, now)
+
+    def invalidate(self, url: Optional[str] = None) -> int:
+        """Remove cached entries.
+
+        Args:
+            url (str, optional): Only remove entries of this url, for any authorization. Defaults to None, remove all.
+
+        Returns:
+            int: Number of removed entries
+        """
+        removed = set()
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if url is None or entry["url"] == url:
+                    self._drop(key)
+                    removed.add(key)
+        if self.disk_dir:
+            entries_dir = os.path.join(self.disk_dir, "entries")
+            for name in os.listdir(entries_dir):
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(entries_dir, name)
+                if url is not None:
+                    try:
+                        with open(path) as f:
+                            if json.load(f)["url"] != url:
+                                continue
+                    except (OSError, ValueError, KeyError):
+                        pass
+                self._remove_file(path)
+                removed.add(name[: -len(".json")])
+            self._collect_disk_blobs()
+        if self.shared:
+            removed |= self.shared.invalidate_requests(url)
+        return len(removed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["revalidated"] + self.counters["misses"]
+            hits = self.counters["hits"] + self.counters["revalidated"]
+            return dict(
+                self.counters,
+                entries=len(self._entries),
+                blobs=len(self._blobs),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                max_entries=self.max_entries,
+                ttl=self.ttl,
+                hit_rate=hits / lookups if lookups else 0.0,
+                disk_dir=self.disk_dir,
+            )
+
+    # memory tier, callers hold self._lock
+    def _store(self, key: str, entry: dict, data: bytes) -> None:
+        if key in self._entries:
+            self._drop(key)
+        if entry["hash"] not in self._blobs:
+            self._blobs[entry["hash"]] = data
+            self._blob_refs[entry["hash"]] = 0
+            self._bytes += len(data)
+        self._blob_refs[entry["hash"]] += 1
+        self._entries[key] = entry
+        while self._entries and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            self._drop(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._blob_refs[entry["hash"]] -= 1
+        if not self._blob_refs[entry["hash"]]:
+            del self._blob_refs[entry["hash"]]
+            self._bytes -= len(self._blobs.pop(entry["hash"]))
+
+    # disk tier
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, "entries", key + ".json")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.disk_dir, "blobs", digest)
+
+    def _read_disk(self, key: str, with_data: bool = True) -> Optional[dict]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._entry_path(key)) as f:
+                entry = json.load(f)
+            if with_data:
+                with open(self._blob_path(entry["hash"]), "rb") as f:
+                    entry["data"] = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry
+
+    def _write_disk(self, key: str, entry: dict, data: bytes) -> None:
+        if not self.disk_dir:
+            return
+        try:
+            blob_path = self._blob_path(entry["hash"])
+            if not os.path.exists(blob_path):
+                self._atomic_write(blob_path, data)
+            self._write_entry(key, entry)
+            if self.disk_max_bytes:
+                self._evict_disk()
+        except OSError as err:
+            logging.warning("could not write fetch cache entry to disk: {}".format(err))
+
+    def _write_entry(self, key: str, entry: dict) -> None:
+        self._atomic_write(self._entry_path(key), json.dumps(entry).encode())
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._remove_file(tmp_path)
+            raise
+
+    def _remove_file(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict_disk(self) -> None:
+        blobs_dir = os.path.join(self.disk_dir, "blobs")
+        blobs = []
+        for name in os.listdir(blobs_dir):
+            if name.startswith(".tmp-"):
+                continue
+            stat = os.stat(os.path.join(blobs_dir, name))
+            blobs.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in blobs)
+        evicted = set()
+        for _, size, name in sorted(blobs):
+            if total <= self.disk_max_bytes:
+                break
+            self._remove_file(os.path.join(blobs_dir, name))
+            evicted.add(name)
+            total -= size
+        if evicted:
+            # entries pointing at an evicted body are unusable
+            entries_dir = os.path.join(self.disk_dir, "entries")
+            for name in os.listdir(entries_dir):
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(entries_dir, name)
+                try:
+                    with open(path) as f:
+                        if json.load(f)["hash"] not in evicted:
+                            continue
+                except (OSError, ValueError, KeyError):
+                    pass
+                self._remove_file(path)
+
+    def _collect_disk_blobs(self) -> None:
+        entries_dir = os.path.join(self.disk_dir, "entries")
+        referenced = set()
+        for name in os.listdir(entries_dir):
+            if name.startswith(".tmp-"):
+                continue
+            try:
+                with open(os.path.join(entries_dir, name)) as f:
+                    referenced.add(json.load(f)["hash"])
+            except (OSError, ValueError, KeyError):
+                pass
+        blobs_dir = os.path.join(self.disk_dir, "blobs")
+        for name in os.listdir(blobs_dir):
+            if name not in referenced and not name.startswith(".tmp-"):
+                self._remove_file(os.path.join(blobs_dir, name))
+
+
+class GraphCache:
+    # rough memory footprint of one triple in the rdflib memory store
+    TRIPLE_BYTES = 1024
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        """Cache of parsed rdflib Graphs keyed by content hash and format.
+
+        Cached graphs are shared between callers and must be treated as read-only.
+        The cache is evicted least recently used first, bounded by the estimated
+        memory of the graphs (triples times TRIPLE_BYTES) and the entry count.
+
+        Args:
+            max_bytes (int): Maximum estimated bytes of cached graphs
+            max_entries (int): Maximum number of cached graphs
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: tuple, graph) -> None:
+        size = len(graph) * self.TRIPLE_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (graph, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.counters["evictions"] += 1
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(
+                self.counters,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                max_entries=self.max_entries,
+                hit_rate=self.counters["hits"] / lookups if lookups else 0.0,
+            )
+
+
+class SharedCache:
+    def __init__(self, path: str, max_bytes: int):
+        """SQLite backed cache shared by all workers on a host using the same file.
+
+        Holds document bodies by content hash, the requests that returned them
+        and json results derived from a body, e.g. extracted entities and types.
+        Every write is a transaction, so workers never see partial entries and
+        an interrupted write leaves the file consistent. Bodies and results are
+        evicted least recently used first once their total size exceeds
+        max_bytes. Database errors are logged and treated as misses.
+
+        Args:
+            path (str): Database file
+            max_bytes (int): Maximum bytes of stored bodies and results
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "result_hits": 0,
+            "result_misses": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, data BLOB, size INTEGER, accessed REAL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS requests (key TEXT PRIMARY KEY, url TEXT, hash TEXT, entry TEXT)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, data TEXT, size INTEGER, accessed REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS requests_hash ON requests (hash)")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            # a crash may lose the last commits but never corrupts the file
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _failed(self, err: Exception) -> None:
+        logging.warning("shared cache {} failed: {}".format(self.path, err))
+        self.count("errors")
+
+    def get_request(self, key: str) -> Optional[dict]:
+        """Entry of a request with its body, as stored by put_request.
+
+        Args:
+            key (str): request_key of url and authorization
+
+        Returns:
+            dict: Entry with keys url, filename, hash, etag, last_modified, validated and data, or None
+        """
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    "SELECT requests.entry, blobs.data FROM requests JOIN blobs ON blobs.hash = requests.hash WHERE requests.key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None:
+                    entry = json.loads(row[0])
+                    db.execute(
+                        "UPDATE blobs SET accessed = ? WHERE hash = ?",
+                        (time.time(), entry["hash"]),
+                    )
+        except sqlite3.Error as err:
+            self._failed(err)
+            return None
+        if row is None:
+            self.count("misses")
+            return None
+        self.count("hits")
+        return dict(entry, data=row[1])
+
+    def put_request(self, key: str, entry: dict, data: bytes) -> None:
+        """Store a request entry and its body, the body once per content hash."""
+        if len(data) > self.max_bytes:
+            return
+        try:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT OR IGNORE INTO blobs (hash, data, size, accessed) VALUES (?, ?, ?, ?)",
+                    (entry["hash"], data, len(data), time.time()),
+                )
+                db.execute(
+                    "INSERT OR REPLACE INTO requests (key, url, hash, entry) VALUES (?, ?, ?, ?)",
+                    (key, entry["url"], entry["hash"], json.dumps(entry)),
+                )
+                self._evict(db)
+        except sqlite3.Error as err:
+            self._failed(err)
+
+    def touch_request(self, key: str, validated: float) -> None:
+        """Set the time a request entry was last validated with the origin."""
+        try:
+            with self._connect() as db:
+                row = db.execute("SELECT entry FROM requests WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = dict(json.loads(row[0]), validated=validated)
+                    db.execute(
+                        "UPDATE requests SET entry = ? WHERE key = ?", (json.dumps(entry), key)
+                    )
+        except sqlite3.Error as err:
+            self._failed(err)
+
+    def invalidate_requests(self, url: Optional[str] = None) -> set:
+        """Remove request entries, of url only if given, and bodies no request refers to anymore.
+
+        Returns:
+            set: Keys of the removed entries
+        """
+        try:
+            with self._connect() as db:
+                if url is None:
+                    keys = {row[0] for row in db.execute("SELECT key FROM requests")}
+                    db.execute("DELETE FROM requests")
+                else:
+                    keys = {
+                        row[0]
+                        for row in db.execute("SELECT key FROM requests WHERE url = ?", (url,))
+                    }
+                    db.execute("DELETE FROM requests WHERE url = ?", (url,))
+                db.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM requests)")
+        except sqlite3.Error as err:
+            self._failed(err)
+            return set()
+        return keys
+
+    def get_result(self, key: str) -> Optional[object]:
+        """Json result stored with put_result, None if missing."""
+        try:
+            with self._connect() as db:
+                row = db.execute("SELECT data FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key)
+                    )
+        except sqlite3.Error as err:
+            self._failed(err)
+            return None
+        if row is None:
+            self.count("result_misses")
+            return None
+        self.count("result_hits")
+        return json.loads(row[0])
+
+    def put_result(self, key: str, result: object) -> None:
+        """Store a json serializable result, e.g. keyed by the content hash of the document it was derived from."""
+        data = json.dumps(result)
+        if len(data) > self.max_bytes:
+            return
+        try:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, data, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, data, len(data), time.time()),
+                )
+                self._evict(db)
+        except sqlite3.Error as err:
+            self._failed(err)
+
+    def clear_results(self) -> int:
+        try:
+            with self._connect() as db:
+                return db.execute("DELETE FROM results").rowcount
+        except sqlite3.Error as err:
+            self._failed(err)
+            return 0
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        # runs in the transaction of the write, so workers never evict concurrently
+        total = db.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM blobs) + (SELECT COALESCE(SUM(size), 0) FROM results)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = db.execute(
+            "SELECT 'blobs', hash, size, accessed FROM blobs UNION ALL SELECT 'results', key, size, accessed FROM results ORDER BY accessed"
+        )
+        evicted = []
+        for table, key, size, _ in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((table, key))
+            total -= size
+        for table, key in evicted:
+            if table == "blobs":
+                db.execute("DELETE FROM blobs WHERE hash = ?", (key,))
+                db.execute("DELETE FROM requests WHERE hash = ?", (key,))
+            else:
+                db.execute("DELETE FROM results WHERE key = ?", (key,))
+        with self._lock:
+            self.counters["evictions"] += len(evicted)
+
+    def stats(self) -> dict:
+        try:
+            with self._connect() as db:
+                blobs, blob_bytes = db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+                ).fetchone()
+                results, result_bytes = db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+                ).fetchone()
+                entries = db.execute("SELECT COUNT(*) FROM requests").fetchone()[0]
+        except sqlite3.Error as err:
+            self._failed(err)
+            blobs = blob_bytes = results = result_bytes = entries = 0
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            result_lookups = self.counters["result_hits"] + self.counters["result_misses"]
+            return dict(
+                self.counters,
+                entries=entries,
+                blobs=blobs,
+                results=results,
+                bytes=blob_bytes + result_bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=self.counters["hits"] / lookups if lookups else 0.0,
+                result_hit_rate=(
+                    self.counters["result_hits"] / result_lookups if result_lookups else 0.0
+                ),
+                path=self.path,
+            )
+
+
+class SingleFlight:
+    def __init__(self):
+        """Coalesce concurrent calls for the same key into one call of the function.
+
+        The first caller of a key runs the function, callers arriving while it
+        runs wait for it and receive its result or exception. Nothing is kept
+        once the call returned, caching is left to the function.
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "coalesced": 0}
+
+    def do(self, key: tuple, func, *args, **kwargs):
+        """Call func(*args, **kwargs) unless a call for key is in flight, then wait for its result.
+
+        Args:
+            key (tuple): Identity of the call, e.g. url and authorization
+            func (callable): Function to call
+
+        Returns:
+            Any: Return value of the call, shared by all coalesced callers
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+                self.counters["calls"] += 1
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = func(*args, **kwargs)
+            return call["result"]
+        except BaseException as err:
+            call["error"] = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.counters["calls"] + self.counters["coalesced"]
+            return dict(
+                self.counters,
+                in_flight=len(self._calls),
+                coalesced_rate=self.counters["coalesced"] / requests if requests else 0.0,
+            )
@@ -0,0 +1,142 @@
+import base64
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """Entity name a cursor points after.
+
+    Raises:
+        ValueError: If the cursor was not created by encode_cursor
+    """
+    try:
+        return base64.b64decode(cursor.encode(), altchars=b"-_", validate=True).decode()
+    except (ValueError, UnicodeError):
+        raise ValueError("invalid cursor {}".format(cursor))
+
+
+class EntityIndex:
+    def __init__(self, entities: dict, base_namespace: str):
+        """Entities of a document sorted by name, with lookups by type and label prefix.
+
+        Args:
+            entities (dict): Entities as returned by query_entities, short entity IRI as key
+            base_namespace (str): Base namespace of the document
+        """
+        self.entities = entities
+        self.base_namespace = base_namespace
+        self.names = sorted(entities)
+        self._by_type = {}
+        for name in self.names:
+            self._by_type.setdefault(entities[name].get("type"), []).append(name)
+        # (lower case label, name) pairs, sorted for prefix range lookups
+        self._labels = sorted(
+            (str(entity.get("text", name)).lower(), name)
+            for name, entity in entities.items()
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def select(
+        self, entity_type: Optional[str] = None, prefix: Optional[str] = None
+    ) -> List[str]:
+        """Sorted names of the entities of entity_type whose label starts with prefix.
+
+        Entities without a label are matched by their name. Prefixes are compared case-insensitive.
+
+        Args:
+            entity_type (str, optional): Type IRI the entities must have
+            prefix (str, optional): Label prefix
+
+        Returns:
+            List[str]: Sorted entity names
+        """
+        names = self.names if entity_type is None else self._by_type.get(entity_type, [])
+        if prefix:
+            prefix = prefix.lower()
+            start = bisect_left(self._labels, (prefix,))
+            # every label with the prefix sorts before prefix + the highest code point
+            end = bisect_right(self._labels, (prefix + "\U0010ffff",))
+            matched = {name for _, name in self._labels[start:end]}
+            names = [name for name in names if name in matched]
+        return names
+
+    def page(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        entity_type: Optional[str] = None,
+        prefix: Optional[str] = None,
+    ) -> Tuple[List[Tuple[str, dict]], Optional[str], int]:
+        """A page of the selected entities in name order.
+
+        Args:
+            cursor (str, optional): Cursor returned with the previous page, None for the first page
+            limit (int, optional): Maximum number of entities, None for all remaining
+            entity_type (str, optional): Type IRI the entities must have
+            prefix (str, optional): Label prefix
+
+        Returns:
+            Tuple[List[Tuple[str, dict]], Optional[str], int]: (name, entity) pairs, cursor of
+            the next page or None if this is the last one, and the number of selected entities
+        """
+        names = self.select(entity_type, prefix)
+        start = bisect_right(names, decode_cursor(cursor)) if cursor else 0
+        end = len(names) if limit is None else min(start + limit, len(names))
+        items = [(name, self.entities[name]) for name in names[start:end]]
+        next_cursor = encode_cursor(names[end - 1]) if end < len(names) else None
+        return items, next_cursor, len(names)
+
+
+class EntityIndexCache:
+    def __init__(self, max_entries: int):
+        """Least recently used cache of entity indexes.
+
+        Args:
+            max_entries (int): Maximum number of cached indexes
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: tuple) -> Optional[EntityIndex]:
+        with self._lock:
+            index = self._entries.get(key)
+            if index is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            self._entries.move_to_end(key)
+            return index
+
+    def put(self, key: tuple, index: EntityIndex) -> None:
+        with self._lock:
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(
+                self.counters,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                hit_rate=self.counters["hits"] / lookups if lookups else 0.0,
+            )
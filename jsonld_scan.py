@@ -0,0 +1,285 @@
+import json
+from typing import Dict, Iterable, Optional, Tuple
+
+from rdflib import RDF, Graph
+from rdflib.plugins.shared.jsonld.context import UNDEF, Context
+from rdflib.plugins.shared.jsonld.keys import (
+    CONTEXT,
+    GRAPH,
+    ID,
+    INCLUDED,
+    JSON,
+    LANG,
+    LIST,
+    NEST,
+    REV,
+    SET,
+    TYPE,
+    VOCAB,
+)
+from rdflib.plugins.shared.jsonld.util import VOCAB_DELIMS
+
+RDF_TYPE = str(RDF.type)
+
+# remote contexts fetched by any scan, shared so each is only downloaded once
+_remote_contexts = {}
+
+
+class Unsupported(Exception):
+    """The document uses JSON-LD features the scanner does not reproduce exactly."""
+
+
+def scan(
+    data: bytes,
+    class_list: Iterable[str],
+    label_predicates: Iterable[str],
+    with_types: bool = True,
+) -> Optional[dict]:
+    """Extract typed nodes of a JSON-LD document without building a graph.
+
+    Walks the JSON tree of the document once, expanding keys and types with
+    the rdflib context processor, and collects the subjects typed with any of
+    class_list together with their label. No triples are created. Documents
+    whose context or structure is unusual, e.g. scoped contexts, reverse
+    properties, named graphs, blank node or ambiguous matches, are not handled
+    and must be parsed with rdflib instead, so results always equal those of
+    the rdflib parser.
+
+    Args:
+        data (bytes): JSON-LD document
+        class_list (Iterable[str]): IRIs of the classes to match rdf:type against, None to skip subjects
+        label_predicates (Iterable[str]): IRIs of the predicates holding the label of a subject
+        with_types (bool, optional): Whether to collect all rdf:type IRIs. Defaults to True.
+
+    Returns:
+        Optional[dict]: Dict with keys types (sorted list or None), subjects (subject IRI to
+        (type IRI, (label predicate IRI, label) or None)) and base_namespace, None if the
+        document can not be scanned
+    """
+    try:
+        doc = json.loads(data)
+        context, resources, has_root = _load(doc)
+        return _Scanner(context, class_list, label_predicates, with_types).run(
+            resources, has_root
+        )
+    except Unsupported:
+        return None
+    except Exception:
+        # let the rdflib parser report broken documents and contexts
+        return None
+
+
+def _load(doc) -> Tuple[Context, list, bool]:
+    # base the rdflib parser resolves relative IRIs against when parsing content
+    context = Context(base=str(Graph().absolutize("")), version=1.1)
+    context._context_cache = _remote_contexts
+    if isinstance(doc, list):
+        return context, doc, False
+    if not isinstance(doc, dict):
+        raise Unsupported()
+    if doc.get(CONTEXT):
+        context.load(doc[CONTEXT], context.base)
+    if any(term.context is not UNDEF for term in context.terms.values()):
+        raise Unsupported()
+    if context.propagate is False:
+        raise Unsupported()
+    return context, [doc], True
+
+
+class _Scanner:
+    def __init__(
+        self,
+        context: Context,
+        class_list: Optional[Iterable[str]],
+        label_predicates: Iterable[str],
+        with_types: bool,
+    ):
+        self.context = context
+        self.class_list = None if class_list is None else set(map(str, class_list))
+        self.label_predicates = set(map(str, label_predicates))
+        self.with_types = with_types
+        self.types = set()
+        # subject IRI -> [matched classes, label candidates]
+        self.subjects: Dict[str, list] = {}
+        self.skip_keys = {CONTEXT, *context.get_keys(ID)}
+        # expansions of keys and type values, which repeat in every node
+        self.key_cache = {}
+        self.type_cache = {}
+        self.unsupported_keys = set()
+        for keyword in (REV, NEST, GRAPH, INCLUDED, SET):
+            self.unsupported_keys.update(context.get_keys(keyword))
+
+    def run(self, resources: list, has_root: bool) -> dict:
+        # entries are (value, whether it is the root object holding the document context)
+        stack = [(node, has_root) for node in reversed(resources)]
+        while stack:
+            value, top = stack.pop()
+            if isinstance(value, list):
+                stack.extend((item, False) for item in reversed(value))
+            elif isinstance(value, dict):
+                self._visit(value, top, stack)
+        return self._result()
+
+    def _visit(self, node: dict, top: bool, stack: list) -> None:
+        context = self.context
+        if context.get_value(node):
+            return
+        node_list = context.get_list(node)
+        if node_list is None:
+            node_list = context.get_set(node)
+        if node_list is not None:
+            stack.append((node_list, False))
+            return
+        if CONTEXT in node and not top:
+            raise Unsupported()
+        id_val = context.get_id(node)
+        subject = None
+        if isinstance(id_val, str) and not id_val.startswith("_:"):
+            subject = context.resolve(id_val)
+            if not subject:
+                raise Unsupported()
+            if ":" not in subject:
+                # the rdflib parser drops the node and everything below it
+                return
+        entry = None
+        children = []
+        for key, obj in node.items():
+            if key in self.skip_keys:
+                continue
+            if key in self.unsupported_keys:
+                raise Unsupported()
+            term = context.terms.get(key)
+            term_id = term.id if term else None
+            if TYPE in (key, term_id):
+                for type_iri in self._types(obj):
+                    self.types.add(type_iri)
+                    if subject is None:
+                        if self.class_list and type_iri in self.class_list:
+                            raise Unsupported()
+                        continue
+                    if entry is None:
+                        entry = self.subjects.setdefault(subject, [set(), set()])
+                    if self.class_list and type_iri in self.class_list:
+                        entry[0].add(type_iri)
+                continue
+            if term and (term.reverse or term.context is not UNDEF):
+                raise Unsupported()
+            if GRAPH == term_id or SET == term_id or INCLUDED == term_id:
+                raise Unsupported()
+            if term and term.type == JSON:
+                continue
+            pred_uri = self._predicate(key, term)
+            if not pred_uri or pred_uri.startswith("_:"):
+                continue
+            if pred_uri == RDF_TYPE:
+                # types given as a plain property with its own coercion
+                raise Unsupported()
+            if isinstance(obj, dict) and term and term.container - {LIST, SET}:
+                if term.container != {LANG} or pred_uri in self.label_predicates:
+                    raise Unsupported()
+                continue
+            if pred_uri in self.label_predicates:
+                if term and (term.type is not UNDEF or LIST in term.container):
+                    raise Unsupported()
+                labels = self._labels(obj)
+                if subject is None:
+                    continue
+                if entry is None:
+                    entry = self.subjects.setdefault(subject, [set(), set()])
+                entry[1].update((pred_uri, label) for label in labels)
+                continue
+            if term and term.type in (ID, VOCAB) and isinstance(obj, str):
+                continue
+            children.append(obj)
+        stack.extend((child, False) for child in reversed(children))
+
+    def _predicate(self, key: str, term) -> Optional[str]:
+        if term:
+            return term.id
+        if key not in self.key_cache:
+            self.key_cache[key] = self.context.expand(key)
+        return self.key_cache[key]
+
+    def _types(self, obj) -> Iterable[str]:
+        for value in obj if isinstance(obj, list) else [obj]:
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                raise Unsupported()
+            if value not in self.type_cache:
+                self.type_cache[value] = self._expand_type(value)
+            type_iri = self.type_cache[value]
+            if type_iri:
+                yield type_iri
+
+    def _expand_type(self, value: str) -> Optional[str]:
+        context = self.context
+        type_id = context.expand(value) or context.resolve_iri(value)
+        if type_id.startswith("_:"):
+            return None
+        type_iri = context.resolve(type_id)
+        if not type_iri:
+            raise Unsupported()
+        return type_iri if ":" in type_iri else None
+
+    def _labels(self, obj) -> Iterable[str]:
+        context = self.context
+        labels = []
+        values = [obj]
+        while values:
+            value = values.pop()
+            if value is None:
+                continue
+            if isinstance(value, list):
+                values.extend(value)
+            elif isinstance(value, str):
+                labels.append(value)
+            elif isinstance(value, dict):
+                items = context.get_set(value)
+                if items is not None:
+                    values.append(items)
+                    continue
+                if context.get_list(value) is not None or context.get_type(value):
+                    raise Unsupported()
+                label = context.get_value(value)
+                if not isinstance(label, str):
+                    raise Unsupported()
+                labels.append(label)
+            else:
+                raise Unsupported()
+        return labels
+
+    def _result(self) -> dict:
+        result = {
+            "types": sorted(self.types) if self.with_types else None,
+            "subjects": None,
+            "base_namespace": self._base_namespace(),
+        }
+        if self.class_list is None:
+            return result
+        subjects = {}
+        for subject, (classes, labels) in self.subjects.items():
+            if not classes:
+                continue
+            # the rdflib path picks an arbitrary one of several matches
+            if len(classes) > 1 or len(labels) > 1:
+                raise Unsupported()
+            subjects[subject] = (
+                next(iter(classes)),
+                next(iter(labels)) if labels else None,
+            )
+        result["subjects"] = subjects
+        return result
+
+    def _base_namespace(self) -> Optional[str]:
+        # bind the context prefixes the same way the rdflib parser does
+        graph = Graph()
+        if self.context.vocab:
+            graph.bind(None, self.context.vocab)
+        for name, term in self.context.terms.items():
+            if term.id and term.id.endswith(VOCAB_DELIMS):
+                graph.bind(name, term.id)
+        for prefix, namespace in graph.namespaces():
+            if prefix == "base":
+                return str(namespace)
+        return None
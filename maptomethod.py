@@ -1,30 +1,158 @@
+import asyncio
+import contextvars
+import functools
 import inspect
+import io
+import itertools
 import json
 import logging
 import sys
 from collections import OrderedDict
+from re import compile as re_compile
 from re import search as re_search
 from re import split as re_split
 from tokenize import Name
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple, Optional
 from urllib.parse import unquote, urlparse, urljoin
 from urllib.request import urlopen, pathname2url
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
 import os
-import github
+import cache
+import ontology_index
+import snapshot
+import jsonld_scan
+import entity_index
+import metrics
+import workers
 from pydantic import AnyUrl
 from rdflib import Graph, Namespace, URIRef
 from rdflib.namespace import CSVW, RDF, RDFS, DefinedNamespaceMeta
-from rdflib.plugins.sparql import prepareQuery
 from rdflib.util import guess_format
-from yaml import Dumper, Loader, dump
+from yaml import Dumper, Loader, SafeLoader, dump, load
 from yaml.representer import SafeRepresenter
+
+try:
+    from yaml import CDumper
+except ImportError:  # PyYAML built without libyaml
+    CDumper = None
 from yaml.resolver import BaseResolver
 
+if TYPE_CHECKING:
+    # imported when the first document is downloaded
+    import requests
+
 SSL_VERIFY = os.getenv("SSL_VERIFY", "True").lower() in ("true", "1", "t")
-if not SSL_VERIFY:
-    requests.packages.urllib3.disable_warnings()
+# use the namespace table below instead of scanning rdflib.namespace at import
+FAST_START = os.getenv("FAST_START", "True").lower() in ("true", "1", "t")
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 16))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", 30))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.5))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 60))
+EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", 8))
+YAML_C_EMITTER = os.getenv("YAML_C_EMITTER", "True").lower() in ("true", "1", "t")
+JSONLD_FAST_PATH = os.getenv("JSONLD_FAST_PATH", "True").lower() in ("true", "1", "t")
+PARSE_BACKEND = os.getenv("PARSE_BACKEND", "thread").lower()
+PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", os.cpu_count() or 1))
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", 120))
+PARSE_MAX_BYTES = int(os.getenv("PARSE_MAX_BYTES", 200 * 1024 * 1024))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", PARSE_MAX_BYTES))
+FETCH_CHUNK_BYTES = 1024 * 1024
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 4))
+ITERATOR_SAMPLE_SIZE = int(os.getenv("ITERATOR_SAMPLE_SIZE", 16))
+ONTOLOGY_INDEX_DIR = os.getenv("ONTOLOGY_INDEX_DIR", "./ontologies/index")
+ONTOLOGY_SNAPSHOT_DIR = os.getenv("ONTOLOGY_SNAPSHOT_DIR", "./ontologies/snapshots")
+
+FETCH_CACHE_MAX_BYTES = int(os.getenv("FETCH_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+FETCH_CACHE_MAX_ENTRIES = int(os.getenv("FETCH_CACHE_MAX_ENTRIES", 256))
+FETCH_CACHE_TTL = float(os.getenv("FETCH_CACHE_TTL", 60))
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR") or None
+FETCH_CACHE_DISK_MAX_BYTES = int(
+    os.getenv("FETCH_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024)
+)
+SHARED_CACHE_DB = os.getenv("SHARED_CACHE_DB") or None
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# purging the caches over the api is disabled while no token is configured
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
+CACHE_ADMIN_HEADER = "X-Admin-Token"
+shared_cache = (
+    cache.SharedCache(SHARED_CACHE_DB, SHARED_CACHE_MAX_BYTES) if SHARED_CACHE_DB else None
+)
+fetch_cache = cache.FetchCache(
+    max_bytes=FETCH_CACHE_MAX_BYTES,
+    max_entries=FETCH_CACHE_MAX_ENTRIES,
+    ttl=FETCH_CACHE_TTL,
+    disk_dir=FETCH_CACHE_DIR,
+    disk_max_bytes=FETCH_CACHE_DISK_MAX_BYTES,
+    shared=shared_cache,
+)
+GRAPH_CACHE_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+ENTITY_INDEX_MAX_ENTRIES = int(os.getenv("ENTITY_INDEX_MAX_ENTRIES", 64))
+GRAPH_CACHE_MAX_ENTRIES = int(os.getenv("GRAPH_CACHE_MAX_ENTRIES", 32))
+graph_cache = cache.GraphCache(
+    max_bytes=GRAPH_CACHE_MAX_BYTES, max_entries=GRAPH_CACHE_MAX_ENTRIES
+)
+entity_index_cache = entity_index.EntityIndexCache(ENTITY_INDEX_MAX_ENTRIES)
+# concurrent identical downloads, entity queries and type queries run once
+flights = {
+    "fetch": cache.SingleFlight(),
+    "entities": cache.SingleFlight(),
+    "types": cache.SingleFlight(),
+}
+
+
+def cache_metrics() -> List[metrics.Metric]:
+    """Counters and sizes of the caches and coalesced call counts, read on every scrape."""
+    events = metrics.Counter(
+        "maptomethod_cache_events_total",
+        "Lookups and evictions of the caches by outcome.",
+        ["cache", "event"],
+    )
+    entries = metrics.Gauge(
+        "maptomethod_cache_entries", "Number of cached entries.", ["cache"]
+    )
+    size = metrics.Gauge(
+        "maptomethod_cache_bytes", "Bytes held by the memory tier of the cache.", ["cache"]
+    )
+    caches = {
+        "fetch": fetch_cache.stats(),
+        "graph": graph_cache.stats(),
+        "entity_index": entity_index_cache.stats(),
+    }
+    if shared_cache is not None:
+        caches["shared"] = shared_cache.stats()
+    coalesced = metrics.Counter(
+        "maptomethod_coalesced_total",
+        "Calls that waited for an identical call in flight instead of running again.",
+        ["call"],
+    )
+    for name, flight in flights.items():
+        coalesced.inc(flight.stats()["coalesced"], call=name)
+    for name, stats in caches.items():
+        for event in (
+            "hits",
+            "revalidated",
+            "disk_hits",
+            "shared_hits",
+            "misses",
+            "result_hits",
+            "result_misses",
+            "evictions",
+            "errors",
+        ):
+            if event in stats:
+                events.inc(stats[event], cache=name, event=event)
+        entries.set(stats["entries"], cache=name)
+        if "bytes" in stats:
+            size.set(stats["bytes"], cache=name)
+    return [events, entries, size, coalesced]
+
+
+metrics.registry.register_collector(cache_metrics)
 
 
 def dict_representer(dumper, data):
@@ -39,7 +167,45 @@ Dumper.add_representer(OrderedDict, dict_representer)
 Loader.add_constructor(BaseResolver.DEFAULT_MAPPING_TAG, dict_constructor)
 Dumper.add_representer(str, SafeRepresenter.represent_str)
 
-sub_classes = prepareQuery("SELECT ?entity WHERE {?entity rdfs:subClassOf* ?parent}")
+# libyaml emitter for generated mappings, used where it produces the same output as Dumper
+if YAML_C_EMITTER and CDumper is not None:
+
+    class MappingDumper(CDumper):
+        pass
+
+    MappingDumper.add_representer(OrderedDict, dict_representer)
+    MappingDumper.add_representer(str, SafeRepresenter.represent_str)
+else:
+    MappingDumper = Dumper
+# scalars libyaml writes like the python emitter: single lines of printable characters of
+# the basic multilingual plane, which are never double quoted, as libyaml escapes astral
+# characters with allow_unicode and folds double quoted scalars differently
+C_EMITTER_TEXT = re_compile("[\x20-\x7e\xa0-\u2027\u202a-\ud7ff\ue000-\ufefe\uff00-\ufffd]*")
+# longer keys are written as complex keys by libyaml and as simple keys by python
+C_EMITTER_KEY_BYTES = 100
+
+
+def c_emitter_safe(value) -> bool:
+    """Whether the libyaml emitter writes value exactly like the python emitter."""
+    if isinstance(value, str):
+        return C_EMITTER_TEXT.fullmatch(value) is not None
+    if isinstance(value, dict):
+        return all(
+            c_emitter_safe(key)
+            and not (isinstance(key, str) and len(key.encode()) > C_EMITTER_KEY_BYTES)
+            and c_emitter_safe(item)
+            for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return all(c_emitter_safe(item) for item in value)
+    return True
+
+
+class MappingLoader(SafeLoader):
+    """Safe yaml loader keeping the order of mappings, for reading back generated mappings."""
+
+
+MappingLoader.add_constructor(BaseResolver.DEFAULT_MAPPING_TAG, dict_constructor)
 
 BFO = Namespace("http://purl.obolibrary.org/obo/")
 BFO_URL = "http://purl.obolibrary.org/obo/bfo.owl"
@@ -57,6 +223,8 @@ IOF_MAT = Namespace(
 )
 
 OA = Namespace("http://www.w3.org/ns/oa#")
+# predicates holding the text entities are matched by
+LABEL_PREDICATES = [RDFS.label, CSVW.name]
 OA_URL = "http://www.w3.org/ns/oa.ttl"
 
 
@@ -89,13 +257,52 @@ def get_rdflib_Namespaces() -> dict:
     return class_dict
 
 
-ontologies = get_rdflib_Namespaces()
+# result of get_rdflib_Namespaces with rdflib 7, regenerate with
+# {name: item["uri"] for name, item in get_rdflib_Namespaces().items()}
+RDFLIB_NAMESPACES = {
+    "BRICK": "https://brickschema.org/schema/Brick#",
+    "CSVW": "http://www.w3.org/ns/csvw#",
+    "DC": "http://purl.org/dc/elements/1.1/",
+    "DCAM": "http://purl.org/dc/dcam/",
+    "DCAT": "http://www.w3.org/ns/dcat#",
+    "DCMITYPE": "http://purl.org/dc/dcmitype/",
+    "DCTERMS": "http://purl.org/dc/terms/",
+    "DOAP": "http://usefulinc.com/ns/doap#",
+    "DefinedNamespace": "<DefinedNamespace>",
+    "FOAF": "http://xmlns.com/foaf/0.1/",
+    "GEO": "http://www.opengis.net/ont/geosparql#",
+    "ODRL2": "http://www.w3.org/ns/odrl/2/",
+    "ORG": "http://www.w3.org/ns/org#",
+    "OWL": "http://www.w3.org/2002/07/owl#",
+    "PROF": "http://www.w3.org/ns/dx/prof/",
+    "PROV": "http://www.w3.org/ns/prov#",
+    "QB": "http://purl.org/linked-data/cube#",
+    "RDF": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "RDFS": "http://www.w3.org/2000/01/rdf-schema#",
+    "SDO": "https://schema.org/",
+    "SH": "http://www.w3.org/ns/shacl#",
+    "SKOS": "http://www.w3.org/2004/02/skos/core#",
+    "SOSA": "http://www.w3.org/ns/sosa/",
+    "SSN": "http://www.w3.org/ns/ssn/",
+    "TIME": "http://www.w3.org/2006/time#",
+    "VANN": "http://purl.org/vocab/vann/",
+    "VOID": "http://rdfs.org/ns/void#",
+    "WGS": "https://www.w3.org/2003/01/geo/wgs84_pos#",
+    "XSD": "http://www.w3.org/2001/XMLSchema#",
+}
+
+if FAST_START:
+    ontologies = {name: {"uri": uri, "src": uri} for name, uri in RDFLIB_NAMESPACES.items()}
+else:
+    ontologies = get_rdflib_Namespaces()
 ontologies["BFO"] = {"uri": str(BFO), "src": BFO_URL}
 ontologies["OA"] = {"uri": str(OA), "src": OA_URL}
 ontologies["CSVW"]["src"] = "https://www.w3.org/ns/csvw.ttl"
 ontologies["IOF"] = {"uri": str(IOF), "src": IOF_URL}
 ontologies["IOF-MAT"] = {"uri": str(IOF_MAT), "src": IOF_MAT_URL}
 ontologies["IOF-QUAL"] = {"uri": str(IOF_QUAL), "src": IOF_QUAL_URL}
+# ontologies compiled into binary snapshots for fast loading
+SNAPSHOT_ONTOLOGIES = ["BFO", "OA", "CSVW", "IOF", "IOF-MAT", "IOF-QUAL"]
 
 
 def open_file(uri: AnyUrl, authorization=None) -> Tuple["filedata":str, "filename":str]:
@@ -114,71 +321,331 @@ def open_file(uri: AnyUrl, authorization=None) -> Tuple["filedata":str, "filenam
                 urljoin("file:", pathname2url(os.path.abspath(uri_parsed.path)))
             )
         filename = unquote(uri_parsed.path).rsplit("/download/upload")[0].split("/")[-1]
-        if uri_parsed.scheme in ["https", "http"]:
-            # r = urlopen(uri)
-            s = requests.Session()
-            s.verify = SSL_VERIFY
-            s.headers.update({"Authorization": authorization})
-            r = s.get(uri, allow_redirects=True, stream=True)
-            # print(r.content)
-            if r.status_code != 200:
-                # logging.info(r.content)
-                raise HTTPException(
-                    status_code=r.status_code, detail="cant get file at {}".format(uri)
-                )
-            filedata = r.content
-            # charset=r.info().get_content_charset()
-            # if not charset:
-            #     charset='utf-8'
-            # filedata = r.read().decode(charset)
-        elif uri_parsed.scheme == "file":
-            filedata = open(unquote(uri_parsed.path), "rb").read()
-        else:
+        if uri_parsed.scheme not in ["https", "http", "file"]:
             raise HTTPException(
                 status_code=400, detail="unknown scheme {}".format(uri_parsed.scheme)
             )
+        with metrics.stage("fetch"):
+            if uri_parsed.scheme == "file":
+                path = unquote(uri_parsed.path)
+                check_fetch_size(os.path.getsize(path), uri)
+                with open(path, "rb") as f:
+                    filedata = f.read()
+            else:
+                filedata = flights["fetch"].do(
+                    (str(uri), authorization), fetch_url, uri, filename, authorization
+                )
+        metrics.document_bytes.observe(len(filedata), scheme=uri_parsed.scheme)
         return filedata, filename
 
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """Process wide http session with pooled keep-alive connections.
+
+    Connections are pooled per host (HTTP_POOL_MAXSIZE each, for up to
+    HTTP_POOL_CONNECTIONS hosts) and requests answered with 429 or 5xx are
+    retried HTTP_RETRIES times with exponential backoff. No more than
+    HTTP_POOL_MAXSIZE connections are open to a host at a time, a request
+    finding all of them busy waits up to HTTP_POOL_TIMEOUT seconds for one
+    to be returned and then fails with urllib3's EmptyPoolError. The
+    Authorization header is not set on the session, it has to be passed per
+    request.
+
+    Returns:
+        requests.Session: Shared session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            # imported on first download, most workers start serving without one
+            import requests
+            import urllib3
+            from requests.adapters import HTTPAdapter
+            from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+            from urllib3.util.retry import Retry
+
+            class WaitingPool:
+                # requests never passes pool_timeout, a blocking pool would wait forever
+                def urlopen(self, *args, **kwargs):
+                    if kwargs.get("pool_timeout") is None:
+                        kwargs["pool_timeout"] = HTTP_POOL_TIMEOUT
+                    return super().urlopen(*args, **kwargs)
+
+            class WaitingAdapter(HTTPAdapter):
+                def init_poolmanager(self, *args, **kwargs):
+                    super().init_poolmanager(*args, **kwargs)
+                    self.poolmanager.pool_classes_by_scheme = {
+                        "http": type("HTTPConnectionPool", (WaitingPool, HTTPConnectionPool), {}),
+                        "https": type("HTTPSConnectionPool", (WaitingPool, HTTPSConnectionPool), {}),
+                    }
+
+            if not SSL_VERIFY:
+                urllib3.disable_warnings()
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=HTTP_RETRY_BACKOFF,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["GET", "HEAD"]),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = WaitingAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=retry,
+                pool_block=True,
+            )
+            session = requests.Session()
+            session.verify = SSL_VERIFY
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def http_pool_stats() -> List[dict]:
+    """Connection reuse of the shared session per host.
+
+    Returns:
+        List[dict]: Per host pool the number of opened connections and of requests sent over them
+    """
+    stats = []
+    if _session is None:
+        return stats
+    for adapter in set(_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats.append(
+                {
+                    "scheme": pool.scheme,
+                    "host": pool.host,
+                    "port": pool.port,
+                    "connections": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "reused": max(pool.num_requests - pool.num_connections, 0),
+                }
+            )
+    return stats
+
+
+def fetch_url(uri: str, filename: str, authorization=None) -> bytes:
+    """Download a document over http(s) through the fetch cache.
+
+    Fresh cache entries are returned without any request. Stale entries are
+    revalidated with a conditional request and reused if the server answers
+    304 Not Modified.
+
+    Args:
+        uri (str): Url to download
+        filename (str): Filename derived from the url
+        authorization (str, optional): Authorization Header value for the request
+
+    Returns:
+        bytes: Document content
+    """
+    cached = fetch_cache.get(uri, authorization)
+    if cached and fetch_cache.is_fresh(cached):
+        fetch_cache.count("hits")
+        logging.debug("fetch cache hit for {}".format(uri))
+        return cached["data"]
+    headers = {"Authorization": authorization}
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
+        headers["If-Modified-Since"] = cached["last_modified"]
+    session = get_session()
+    from urllib3.exceptions import EmptyPoolError
+
+    try:
+        r = session.get(
+            uri, headers=headers, allow_redirects=True, stream=True, timeout=HTTP_TIMEOUT
+        )
+    except EmptyPoolError:
+        raise HTTPException(
+            status_code=503,
+            detail="no free connection to {} within {} seconds".format(uri, HTTP_POOL_TIMEOUT),
+        )
+    with r:
+        if cached and r.status_code == 304:
+            fetch_cache.count("revalidated")
+            fetch_cache.touch(uri, authorization)
+            logging.debug("fetch cache revalidated {}".format(uri))
+            return cached["data"]
+        if r.status_code != 200:
+            raise HTTPException(
+                status_code=r.status_code, detail="cant get file at {}".format(uri)
+            )
+        fetch_cache.count("misses")
+        filedata = read_response(r, uri)
+    fetch_cache.put(
+        uri,
+        authorization,
+        filedata,
+        filename,
+        etag=r.headers.get("ETag"),
+        last_modified=r.headers.get("Last-Modified"),
+    )
+    return filedata
+
+
+def check_fetch_size(size: int, uri: str) -> None:
+    """Reject documents larger than FETCH_MAX_BYTES."""
+    if FETCH_MAX_BYTES and size > FETCH_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail="{} is larger than the limit of {} bytes".format(uri, FETCH_MAX_BYTES),
+        )
+
+
+def read_response(r: "requests.Response", uri: str) -> bytes:
+    """Body of a streamed response, read in chunks up to FETCH_MAX_BYTES.
+
+    Responses announcing more than FETCH_MAX_BYTES in their Content-Length are
+    rejected before reading the body, others as soon as more arrived. Chunks
+    are appended to a BytesIO, whose buffer is returned without a copy, so
+    the complete body is only held once instead of as chunks and their joined
+    copy.
+
+    Args:
+        r (requests.Response): Response of a request with stream=True
+        uri (str): Requested url, for error messages
+
+    Returns:
+        bytes: Response body
+    """
+    content_length = r.headers.get("Content-Length")
+    if content_length and content_length.isdigit():
+        check_fetch_size(int(content_length), uri)
+    size = 0
+    body = io.BytesIO()
+    for chunk in r.iter_content(chunk_size=FETCH_CHUNK_BYTES):
+        size += len(chunk)
+        check_fetch_size(size, uri)
+        body.write(chunk)
+    return body.getvalue()
+
+
+def parse_graph(data: bytes, format: str) -> Graph:
+    """Parse document content into a Graph, reusing graphs of identical content.
+
+    The returned Graph may be shared with other callers and must not be modified.
+
+    Args:
+        data (bytes): Document content
+        format (str): rdflib parser format
+
+    Returns:
+        Graph: Parsed graph
+    """
+    key = (cache.content_hash(data), format)
+    graph = graph_cache.get(key)
+    if graph is None:
+        graph = Graph()
+        with metrics.stage("parse"):
+            graph.parse(data=data, format=format)
+        graph_cache.put(key, graph)
+    return graph
+
+
+def find_ontology(term: URIRef) -> Optional[str]:
+    """Key of the registered ontology whose namespace contains term.
+
+    Args:
+        term (URIRef): Class or property IRI
+
+    Returns:
+        str: Key in ontologies or None
+    """
+    ontology_url = re_split(r"/|#", term[::-1], maxsplit=1)[-1][::-1]
+    for key, item in ontologies.items():
+        if ontology_url in item["uri"]:
+            return key
+    return None
+
+
+def snapshot_path(key: str) -> str:
+    return os.path.join(ONTOLOGY_SNAPSHOT_DIR, key + ".m2m")
+
+
+def parse_ontology(key: str) -> Graph:
+    """Download and parse the source of the ontology registered at key.
+
+    Args:
+        key (str): Key in ontologies
+
+    Returns:
+        Graph: Parsed ontology
+    """
+    ontology_url = ontologies[key]["src"]
+    logging.info("Loading ontology {} at {}".format(key, ontology_url))
+    onto_data, onto_name = open_file(ontology_url)
+    return parse_graph(onto_data, guess_format(onto_name))
+
+
+def load_ontology(key: str) -> Graph:
+    """Load the ontology registered at key, from its binary snapshot if there is one.
+
+    Ontologies listed in SNAPSHOT_ONTOLOGIES are compiled into a snapshot the
+    first time they are parsed from source.
+
+    Args:
+        key (str): Key in ontologies
+
+    Returns:
+        Graph: Ontology graph
+    """
+    path = snapshot_path(key)
+    if os.path.exists(path):
+        try:
+            return snapshot.load_snapshot(path)
+        except (OSError, ValueError) as err:
+            logging.warning("could not load snapshot {}: {}".format(path, err))
+    ontology = parse_ontology(key)
+    if key in SNAPSHOT_ONTOLOGIES:
+        try:
+            snapshot.write_snapshot(ontology, path)
+        except OSError as err:
+            logging.warning("could not write snapshot {}: {}".format(path, err))
+    return ontology
+
+
+def refresh_ontology(key: str) -> None:
+    """Rebuild the snapshot and subclass index of the ontology registered at key from its source.
+
+    Args:
+        key (str): Key in ontologies
+    """
+    fetch_cache.invalidate(ontologies[key]["src"])
+    snapshot.write_snapshot(parse_ontology(key), snapshot_path(key))
+    subclass_index.build(key)
+
+
+subclass_index = ontology_index.SubclassIndex(ONTOLOGY_INDEX_DIR, load_ontology)
+
+
 def get_all_sub_classes(superclass: URIRef, authorization=None) -> List[URIRef]:
     """Gets all subclasses of a given class.
 
+    Subclasses are looked up in the precomputed subclass index of the registered
+    ontology defining the class, which is built on first use.
+
     Args:
         superclass (URIRef): Rdflib URIRef of the superclass
 
     Returns:
-        List[URIRef]: List of all subclasses
+        List[URIRef]: List of all subclasses, including the superclass
     """
     if not str(superclass):
         return []
-    ontology_url = re_split(r"/|#", superclass[::-1], maxsplit=1)[-1][::-1]
-    # lookup in ontologies
-    result = [
-        (key, item["src"])
-        for key, item in ontologies.items()
-        if ontology_url in item["uri"]
-    ]
-    # print(ontology_url,result)
-    if result:
-        ontology_url = result[0][1]
-        logging.info(
-            "Fetching all subclasses of {} in ontology at {}".format(
-                superclass, ontology_url
-            )
-        )
-        onto_data, onto_name = open_file(ontology_url, authorization)
-        ontology = Graph()
-        # parse template and add mapping results
-        ontology.parse(data=onto_data, format=guess_format(onto_name))
-        results = list(
-            ontology.query(
-                sub_classes,
-                initBindings={"parent": superclass},
-                # initNs={'cco': CCO, 'mseo': MSEO},
-            ),
-        )
-        # print(list(ontology[ : RDFS.subClassOf]))
-        classes = [result[0] for result in results]
+    key = find_ontology(superclass)
+    if key:
+        classes = subclass_index.descendants(key, superclass)
     else:
         classes = [
             superclass,
@@ -208,10 +675,13 @@ class Mapper:
         ],
         mapping_predicate_uri: URIRef = ContentToBearingRelation,
         data_subject_types: List[URIRef] = [OA.Annotation, CSVW.Column],
-        subjects: List[URIRef] = [],
-        objects: List[URIRef] = [],
+        subjects: Optional[dict] = None,
+        objects: Optional[dict] = None,
         maplist: List[Tuple[str, str]] = [],
         authorization=None,
+        base_ns_subjects: Optional[str] = None,
+        base_ns_objects: Optional[str] = None,
+        iterators: Optional[Dict[str, Tuple[str, str]]] = None,
     ):
         """Mapper Class for creating Rule based yarrrml mappings for data metadata to link to a template knowledge graph.
 
@@ -222,10 +692,13 @@ class Mapper:
             template_object_types (List[URIRef], optional): List of URIRef objects defining classes to query for as objects in the template graph. Defaults to [InformtionContentEntity,TemporalRegionClass].
             mapping_predicate_uri (URIRef, optional): Object property to use as predicate to link. Defaults to ContentToBearingRelation.
             data_subject_types (List[URIRef], optional): List of URIRef objects defining classes to query for as subjects in the data metadata. Defaults to [OA.Annotation,CSVW.Column].
-            subjects (dict, optional): Dict of subject individuals from data metadata. Defaults to [].
-            objects (dict, optional): Dict of object individuals from template knowledge graph. Defaults to [].
+            subjects (dict, optional): Dict of subject individuals from data metadata, may be empty. Defaults to querying them from data_url.
+            objects (dict, optional): Dict of object individuals from template knowledge graph, may be empty. Defaults to querying them from template_url.
             maplist (List[Tuple[str, str]], optional): List of pairs mapping object names in template to subject IDs in data. Defaults to [].
             authorization (str, optional): Authorization Header value for requests to external URLs.
+            base_ns_subjects (str, optional): Base namespace of given subjects. Defaults to data_url + "/".
+            base_ns_objects (str, optional): Base namespace of given objects. Defaults to template_url + "/".
+            iterators (dict, optional): Already discovered (iterator, source name) per lookup field of the data. Defaults to discovering them when creating the mapping.
         """
         logging.info(
             "Following Namespaces available to Mapper: {}".format(ontologies.keys())
@@ -237,27 +710,28 @@ class Mapper:
         self.authorization = authorization
         logging.debug("checking objects and subjects populated")
         # file_data, file_name =open_file(data_url)
-        if not objects:
+        if objects is None:
             self.objects, base_ns_objects = query_entities(
                 self.template_url, template_object_types, self.authorization
             )
             self.base_ns_objects = base_ns_objects
         else:
             self.objects = objects
-            self.base_ns_objects = self.template_url + "/"
+            self.base_ns_objects = base_ns_objects or self.template_url + "/"
         logging.debug("namespace objects: " + self.base_ns_objects)
 
-        if not subjects:
+        if subjects is None:
             self.subjects, base_ns_subjects = query_entities(
                 self.data_url, data_subject_types, self.authorization
             )
             self.base_ns_subjects = base_ns_subjects
         else:
             self.subjects = subjects
-            self.base_ns_subjects = self.data_url + "/"
+            self.base_ns_subjects = base_ns_subjects or self.data_url + "/"
         logging.debug("namespace subjects: " + self.base_ns_subjects)
 
         self.maplist = maplist
+        self.iterators = iterators
 
     # templates for context managers
     def __enter__(self):
@@ -289,169 +763,397 @@ class Mapper:
             self.subjects,
             self.mapping_predicate_uri,
             self.authorization,
+            self.iterators,
         )
         return results
 
-    def to_pretty_yaml(self) -> str:
+    def iter_pretty_yaml(self, format: str = "yaml") -> dict:
+        """Return filename and the serialized yarrrml mapping as chunks created while iterated.
+
+        Args:
+            format (str, optional): yaml or json. Defaults to "yaml".
+
+        Returns:
+            dict: Dict with keys filename and filedata, an iterator of yaml or json text chunks
+        """
+        result = get_mapping_output(
+            self.data_url,
+            self.use_template_rowwise,
+            self.base_ns_subjects,
+            self.base_ns_objects,
+            self.maplist,
+            self.subjects,
+            self.mapping_predicate_uri,
+            self.authorization,
+            self.iterators,
+            lazy=True,
+        )
+        result["filedata"] = iter_dump_mapping(result["filedata"], format)
+        if format == "json":
+            result["filename"] = result["filename"].rsplit(".", 1)[0] + ".json"
+        return result
+
+    def to_pretty_yaml(self, format: str = "yaml") -> dict:
+        """Return filename and serialized yarrrml mapping.
+
+        Args:
+            format (str, optional): yaml or json. Defaults to "yaml".
+
+        Returns:
+            dict: Dict with keys filename and filedata, the mapping as yaml or json text
+        """
         result = self.to_yaml()
-        result["filedata"] = dump(result["filedata"], Dumper=Dumper, allow_unicode=True)
+        result["filedata"] = dump_mapping(result["filedata"], format)
+        if format == "json":
+            result["filename"] = result["filename"].rsplit(".", 1)[0] + ".json"
         return result
 
+    @classmethod
+    def batch(
+        cls,
+        template_url: str,
+        jobs: List[Tuple[str, List[Tuple[str, str]]]],
+        use_template_rowwise: bool = False,
+        template_object_types: List[URIRef] = [
+            InformtionContentEntity,
+            TemporalRegionClass,
+        ],
+        mapping_predicate_uri: URIRef = ContentToBearingRelation,
+        data_subject_types: List[URIRef] = [OA.Annotation, CSVW.Column],
+        authorization=None,
+        max_workers: int = None,
+    ) -> List[dict]:
+        """Create the mappings of many data documents against one template.
+
+        The template entities are resolved once and shared by all jobs, the data
+        documents are processed on a bounded thread pool.
+
+        Args:
+            template_url (str): URL to template knowledge graph shared by all jobs
+            jobs (List[Tuple[str, List[Tuple[str, str]]]]): Pairs of data url and maplist
+            use_template_rowwise (bool, optional): Whether to duplicate the template for each data row. Defaults to False.
+            template_object_types (List[URIRef], optional): Classes to query for as objects in the template graph.
+            mapping_predicate_uri (URIRef, optional): Object property to use as predicate to link. Defaults to ContentToBearingRelation.
+            data_subject_types (List[URIRef], optional): Classes to query for as subjects in the data metadata.
+            authorization (str, optional): Authorization Header value for requests to external URLs.
+            max_workers (int, optional): Size of the worker pool. Defaults to BATCH_WORKERS.
+
+        Returns:
+            List[dict]: Per job in order, a dict with data_url, filename and filedata (yaml), or data_url and error
+        """
+        objects, base_ns_objects = query_entities(
+            template_url, template_object_types, authorization
+        )
+
+        def run_job(job):
+            data_url, maplist = job
+            try:
+                result = cls(
+                    data_url,
+                    template_url,
+                    use_template_rowwise,
+                    template_object_types=template_object_types,
+                    mapping_predicate_uri=mapping_predicate_uri,
+                    data_subject_types=data_subject_types,
+                    objects=objects,
+                    base_ns_objects=base_ns_objects,
+                    maplist=maplist,
+                    authorization=authorization,
+                ).to_pretty_yaml()
+            except Exception as err:
+                logging.warning("batch mapping of {} failed: {}".format(data_url, err))
+                detail = err.detail if isinstance(err, HTTPException) else str(err)
+                return {"data_url": data_url, "error": detail}
+            return dict(result, data_url=data_url)
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or BATCH_WORKERS, thread_name_prefix="batch"
+        ) as pool:
+            return list(pool.map(run_job, jobs))
+
+
+def load_json(data_url: str, authorization=None) -> Optional[object]:
+    """Load and decode a JSON document.
 
-def find_jsonpath_iterator(data_url: str, field_name: str, authorization=None) -> Tuple[str, str]:
-    """
-    Find the JSONPath iterator for objects containing a specific field.
-    
     Args:
         data_url: URL to the JSON file
-        field_name: Field to search for (e.g., "label", "name")
         authorization: Authorization header
-        
+
     Returns:
-        Tuple of (iterator_pattern, source_name)
-        e.g., ("$.notes[*]", "annotations") or ("$.tables[*].tableSchema.columns[*]", "columns")
+        Decoded JSON data, or None if the document is no valid JSON
     """
-    # Load the JSON file
     filedata, filename = open_file(data_url, authorization)
     try:
         # Decode bytes to string if necessary
         if isinstance(filedata, bytes):
             filedata = filedata.decode('utf-8')
-        json_data = json.loads(filedata)
+        return json.loads(filedata)
     except (json.JSONDecodeError, UnicodeDecodeError) as e:
         logging.error(f"Failed to parse JSON from {data_url}: {e}")
-        # Fallback to generic iterator
-        return ("$..[*]", field_name + "_source")
-    
-    def find_array_with_field(obj, path="$", field=None):
-        """
-        Recursively search for arrays containing objects with the specified field.
-        Properly handles nested arrays by adding [*] notation for each array level.
-        Returns list of tuples: (jsonpath, array_key_name)
-        """
-        results = []
-        
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                new_path = f"{path}.{key}"
-                if isinstance(value, list) and len(value) > 0:
-                    # Check if this array contains objects with our field
-                    if isinstance(value[0], dict) and field in value[0]:
-                        results.append((f"{new_path}[*]", key))
-                    # Continue searching recursively within the array
-                    # But add [*] to the path since we're traversing into an array
-                    results.extend(find_array_with_field(value, f"{new_path}[*]", field))
-                else:
-                    results.extend(find_array_with_field(value, new_path, field))
-        elif isinstance(obj, list):
-            # When traversing a list, check each item
-            for item in obj:
-                # Don't modify the path - we already added [*] when we entered the array
-                results.extend(find_array_with_field(item, path, field))
-        
-        return results
-    
-    # Find all arrays containing the field
-    found_paths = find_array_with_field(json_data, "$", field_name)
-    
-    if not found_paths:
-        logging.warning(f"Could not find array with field '{field_name}' in {data_url}, using fallback")
-        return ("$..[*]", field_name + "_source")
-    
-    # Use the first match
-    iterator_pattern, array_key = found_paths[0]
-    
-    # Determine source name based on array key or field name
+        return None
+
+
+def get_source_name(array_key: str) -> str:
+    """Name of the yarrrml source iterating over the array at array_key."""
     if "note" in array_key.lower() or "annotation" in array_key.lower():
-        source_name = "annotations"
+        return "annotations"
     elif "column" in array_key.lower():
-        source_name = "columns"
+        return "columns"
     elif "table" in array_key.lower():
-        source_name = "tables"
+        return "tables"
     else:
         # Use the array key name as source name
-        source_name = array_key.lower()
-    
-    logging.info(f"Found JSONPath iterator for field '{field_name}': {iterator_pattern} (source: {source_name})")
-    return (iterator_pattern, source_name)
+        return array_key.lower()
 
 
-def get_all_types(data_url: str, authorization=None) -> List[str]:
-    """Get all unique rdf:type values from a semantic document.
-    
+def discover_jsonpath_iterators(
+    json_data, field_names: List[str], sample_size: int = None
+) -> Tuple[Dict[str, Tuple[str, str]], dict]:
+    """
+    Search arrays of objects containing any of the given fields, visiting only a sample of each array.
+
+    The document is walked iteratively in document order, so the first match of
+    each field is the same as in a full recursive search over the sampled
+    elements. Only the first sample_size elements of every array are checked
+    and descended into, which keeps the cost bound by the structure of the
+    document instead of the number of rows. The walk stops as soon as every
+    field has been found.
+
     Args:
-        data_url: URL to the semantic document
-        authorization: Authorization header for HTTP requests
-    
+        json_data: Decoded JSON document
+        field_names: Fields to search for (e.g., ["label", "name"])
+        sample_size: Elements visited per array. Defaults to ITERATOR_SAMPLE_SIZE.
+
     Returns:
-        List of full IRI strings for all types found
+        Tuple of a dict with field name as key and (iterator_pattern, array_key) as value for all found fields
+        and a dict reporting the cost of the search (nodes visited, arrays sampled, elements skipped, early exit)
     """
-    logging.info("Extracting all rdf:type values from: {}".format(data_url))
-    
-    # Determine format
-    if data_url.endswith("/download/upload"):
-        format = "json-ld"
-    else:
-        format = guess_format(data_url)
-    
-    # Load the semantic document
-    data_data, data_name = open_file(data_url, authorization)
-    data = Graph()
-    data.parse(data=data_data, format=format)
-    
-    # Query for all unique type objects
-    types = set()
-    for s, p, o in data.triples((None, RDF.type, None)):
-        if isinstance(o, URIRef):
-            types.add(str(o))
-    
-    type_list = sorted(list(types))
-    logging.info("Found {} unique types: {}".format(len(type_list), type_list))
-    
-    return type_list
+    if sample_size is None:
+        sample_size = ITERATOR_SAMPLE_SIZE
+    found = {}
+    pending = set(field_names)
+    cost = {"nodes": 0, "arrays": 0, "skipped": 0, "early_exit": False}
+    # entries are ("node", obj, path) or ("array", key, items, path) with
+    # path already ending in [*], pushed in reverse to pop in document order
+    stack = [("node", json_data, "$")]
+    while stack:
+        if not pending:
+            cost["early_exit"] = True
+            break
+        entry = stack.pop()
+        if entry[0] == "array":
+            _, key, items, path = entry
+            cost["arrays"] += 1
+            sample = items[:sample_size]
+            cost["skipped"] += len(items) - len(sample)
+            # Check if this array contains objects with our fields
+            for field in [field for field in field_names if field in pending]:
+                if any(isinstance(item, dict) and field in item for item in sample):
+                    found[field] = (path, key)
+                    pending.discard(field)
+            # Continue searching within the sampled elements
+            for item in reversed(sample):
+                stack.append(("node", item, path))
+            continue
+        _, obj, path = entry
+        cost["nodes"] += 1
+        if isinstance(obj, dict):
+            children = []
+            for key, value in obj.items():
+                new_path = f"{path}.{key}"
+                if isinstance(value, list) and len(value) > 0:
+                    # add [*] to the path since we're traversing into an array
+                    children.append(("array", key, value, f"{new_path}[*]"))
+                elif isinstance(value, (dict, list)):
+                    children.append(("node", value, new_path))
+            stack.extend(reversed(children))
+        elif isinstance(obj, list):
+            # nested arrays keep the path, the [*] was added when entering the outer array
+            sample = obj[:sample_size]
+            cost["skipped"] += len(obj) - len(sample)
+            for item in reversed(sample):
+                if isinstance(item, (dict, list)):
+                    stack.append(("node", item, path))
+    return found, cost
 
 
-def query_entities(
-    data_url: str, entity_classes: List[URIRef], authorization=None
-) -> dict:
-    """Get all named individuals at data_url location that are of any type in entity_classes.
+def find_jsonpath_iterators(json_data, field_names: List[str]) -> Dict[str, Tuple[str, str]]:
+    """
+    Find the JSONPath iterators for objects containing any of the given fields in one traversal.
 
     Args:
-        data_url (AnyUrl): Url to metadata to use
-        entity_classes (List[URIRef]): List of rdflib URIRef as class types to query for.
+        json_data: Decoded JSON document, None if it could not be loaded
+        field_names: Fields to search for (e.g., ["label", "name"])
 
     Returns:
-        dict: Dict with short entity IRI as key
+        Dict with field name as key and tuple of (iterator_pattern, source_name) as value
+        e.g., {"label": ("$.notes[*]", "annotations"), "name": ("$.tables[*].tableSchema.columns[*]", "columns")}
     """
-    # Use entity classes directly - no subclass expansion needed
-    class_list = entity_classes
-    logging.info(
-        "query data at url: {}\nfor entity classes: {}".format(data_url, class_list)
-    )
-    # fix for crude ckan url
-    if data_url.endswith("/download/upload"):
-        format = "json-ld"
-    else:
-        format = guess_format(data_url)
-    data_data, data_name = open_file(data_url, authorization)
-    data = Graph()
-    # parse template and add mapping results
-    data.parse(data=data_data, format=format)
-    # find base iri if any
-    # print(list(data.namespaces()))
-    base_ns = None
-    for ns_prefix, namespace in data.namespaces():
-        if ns_prefix == "base":
-            logging.debug("found base namespace: {}.".format(namespace))
-            base_ns = namespace
-            break
-    if not base_ns:
-        base_ns = data_url + "/"
+    found = {}
+    if json_data is not None:
+        with metrics.stage("iterator_discovery"):
+            found, cost = discover_jsonpath_iterators(json_data, field_names)
+        logging.info(
+            "JSONPath iterator discovery visited {nodes} nodes in {arrays} arrays, skipped {skipped} array elements, early exit: {early_exit}".format(
+                **cost
+            )
+        )
 
-    data_entities = dict()
-    # Get subjects with their types
-    subject_types = {}
-    for s, p, o in data.triples((None, RDF.type, None)):
+    iterators = {}
+    for field in field_names:
+        if field not in found:
+            logging.warning(f"Could not find array with field '{field}', using fallback")
+            iterators[field] = ("$..[*]", field + "_source")
+            continue
+        iterator_pattern, array_key = found[field]
+        source_name = get_source_name(array_key)
+        logging.info(f"Found JSONPath iterator for field '{field}': {iterator_pattern} (source: {source_name})")
+        iterators[field] = (iterator_pattern, source_name)
+    return iterators
+
+
+def discover_iterators(
+    data_url: str, subjects: dict, authorization=None
+) -> Dict[str, Tuple[str, str]]:
+    """Discover the JSONPath iterators of all lookup fields used by the given subjects.
+
+    Args:
+        data_url: URL to the JSON file
+        subjects: Dict of data subjects as returned by query_entities
+        authorization: Authorization header
+
+    Returns:
+        Dict with field name as key and tuple of (iterator_pattern, source_name) as value
+    """
+    fields = sorted({value["property"] for value in subjects.values() if "property" in value})
+    if not fields:
+        return {}
+    return find_jsonpath_iterators(load_json(data_url, authorization), fields)
+
+
+def find_jsonpath_iterator(data_url: str, field_name: str, authorization=None) -> Tuple[str, str]:
+    """
+    Find the JSONPath iterator for objects containing a specific field.
+    
+    Args:
+        data_url: URL to the JSON file
+        field_name: Field to search for (e.g., "label", "name")
+        authorization: Authorization header
+        
+    Returns:
+        Tuple of (iterator_pattern, source_name)
+        e.g., ("$.notes[*]", "annotations") or ("$.tables[*].tableSchema.columns[*]", "columns")
+    """
+    json_data = load_json(data_url, authorization)
+    return find_jsonpath_iterators(json_data, [field_name])[field_name]
+
+
+def guess_data_format(data_url: str) -> str:
+    """rdflib parser format of the document at data_url."""
+    # fix for crude ckan url
+    if data_url.endswith("/download/upload"):
+        return "json-ld"
+    return guess_format(data_url)
+
+
+def check_parse_size(data: bytes, data_url: str) -> None:
+    """Reject documents larger than PARSE_MAX_BYTES before parsing them."""
+    if PARSE_MAX_BYTES and len(data) > PARSE_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail="{} is {} bytes, more than the limit of {} bytes".format(
+                data_url, len(data), PARSE_MAX_BYTES
+            ),
+        )
+
+
+def load_graph(data_url: str, authorization=None) -> Graph:
+    """Fetch and parse the semantic document at data_url.
+
+    Args:
+        data_url: URL to the semantic document
+        authorization: Authorization header for HTTP requests
+
+    Returns:
+        Graph: Parsed document, shared through the graph cache and not to be modified
+    """
+    data_data, data_name = open_file(data_url, authorization)
+    check_parse_size(data_data, data_url)
+    return parse_graph(data_data, guess_data_format(data_url))
+
+
+def extract_types(data: Graph) -> List[str]:
+    """Sorted unique rdf:type IRIs in a graph."""
+    types = set()
+    for s, p, o in data.triples((None, RDF.type, None)):
+        if isinstance(o, URIRef):
+            types.add(str(o))
+    return sorted(list(types))
+
+
+def resolve_classes(
+    entity_classes: List[URIRef], include_subclasses: bool = False, authorization=None
+) -> set:
+    """Set of classes to match entities against, optionally expanded by all subclasses."""
+    if not include_subclasses:
+        return set(entity_classes)
+    class_list = set()
+    for entity_class in entity_classes:
+        class_list.update(get_all_sub_classes(URIRef(entity_class), authorization))
+    return class_list
+
+
+def entity_record(subject, entity_type=None, label: Optional[tuple] = None) -> dict:
+    """Entity entry of a subject as returned by extract_entities.
+
+    Args:
+        subject (URIRef): Subject IRI
+        entity_type (URIRef, optional): Matched class of the subject
+        label (tuple, optional): Pair of label predicate and label text
+
+    Returns:
+        dict: Dict with uri, type and, if labeled, property and text
+    """
+    if label:
+        p, o = label
+        return {
+            "uri": str(subject),
+            "property": strip_namespace(URIRef(p)),
+            "text": str(o),
+            "type": str(entity_type) if entity_type else None,
+        }
+    return {
+        "uri": str(subject),
+        "type": str(entity_type) if entity_type else None,
+    }
+
+
+def extract_entities(data: Graph, data_url: str, class_list: set) -> Tuple[dict, str]:
+    """Named individuals in a graph that are of any type in class_list.
+
+    Args:
+        data (Graph): Parsed document
+        data_url (str): Url of the document, used as base namespace if it defines none
+        class_list (set): Classes to match rdf:type against
+
+    Returns:
+        Tuple[dict, str]: Dict with short entity IRI as key and the base namespace
+    """
+    # find base iri if any
+    # print(list(data.namespaces()))
+    base_ns = None
+    for ns_prefix, namespace in data.namespaces():
+        if ns_prefix == "base":
+            logging.debug("found base namespace: {}.".format(namespace))
+            base_ns = namespace
+            break
+    if not base_ns:
+        base_ns = data_url + "/"
+
+    data_entities = dict()
+    # Get subjects with their types
+    subject_types = {}
+    for s, p, o in data.triples((None, RDF.type, None)):
         if o in class_list:
             subject_types[s] = o
     
@@ -461,31 +1163,337 @@ def query_entities(
         pos = [
             (p, o)
             for (p, o) in data.predicate_objects(s)
-            if p in [RDFS.label, CSVW.name]
+            if p in LABEL_PREDICATES
         ]
         # name=s.rsplit('/',1)[-1].rsplit('#',1)[-1]
         name = strip_namespace(s)
-        print(s, pos)
         
         # Include type information
-        entity_type = subject_types.get(s)
-        if pos:
-            p, o = pos[0]
-            data_entities[name] = {
-                "uri": str(s),
-                "property": strip_namespace(p),
-                "text": str(o),
-                "type": str(entity_type) if entity_type else None,
-            }
-        else:
-            data_entities[name] = {
-                "uri": str(s),
-                "type": str(entity_type) if entity_type else None,
-            }
+        data_entities[name] = entity_record(
+            s, subject_types.get(s), pos[0] if pos else None
+        )
     logging.info("query resuls: {}".format(data_entities))
     return data_entities, base_ns
 
 
+def analyze_data(
+    data: bytes,
+    format: str,
+    data_url: str,
+    class_list: Optional[set] = None,
+    with_types: bool = True,
+) -> dict:
+    """Parse document content and extract its types and entities.
+
+    Runs in the worker processes of the process parse backend, so it takes and
+    returns only plain data.
+
+    Args:
+        data (bytes): Document content
+        format (str): rdflib parser format
+        data_url (str): Url of the document
+        class_list (set, optional): Classes of the entities to extract, None to skip entities
+        with_types (bool, optional): Whether to extract the rdf:type list. Defaults to True.
+
+    Returns:
+        dict: Dict with keys types, entities and base_namespace, None for skipped parts
+    """
+    if JSONLD_FAST_PATH and format == "json-ld":
+        with metrics.stage("jsonld_scan"):
+            scanned = jsonld_scan.scan(data, class_list, LABEL_PREDICATES, with_types)
+        result = scanned_result(scanned, data_url) if scanned is not None else None
+        if result is not None:
+            return result
+    data_graph = parse_graph(data, format)
+    result = {"types": None, "entities": None, "base_namespace": None}
+    with metrics.stage("entity_query"):
+        if with_types:
+            result["types"] = extract_types(data_graph)
+        if class_list is not None:
+            entities, base_ns = extract_entities(data_graph, data_url, class_list)
+            result["entities"] = entities
+            result["base_namespace"] = str(base_ns)
+    return result
+
+
+def scanned_result(scanned: dict, data_url: str) -> Optional[dict]:
+    """Result of analyze_data from the output of jsonld_scan.scan.
+
+    Returns:
+        Optional[dict]: Result, None if short entity IRIs collide, which the rdflib path resolves arbitrarily
+    """
+    result = {"types": scanned["types"], "entities": None, "base_namespace": None}
+    if scanned["subjects"] is not None:
+        entities = {
+            strip_namespace(URIRef(subject)): entity_record(subject, entity_type, label)
+            for subject, (entity_type, label) in scanned["subjects"].items()
+        }
+        if len(entities) != len(scanned["subjects"]):
+            return None
+        result["entities"] = entities
+        result["base_namespace"] = scanned["base_namespace"] or data_url + "/"
+    return result
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> workers.WorkerPool:
+    """Worker processes of the process parse backend, started on first use."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            import multiprocessing
+
+            _process_pool = workers.WorkerPool(
+                PARSE_PROCESSES, multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+def analyze_document(
+    data_url: str,
+    class_list: Optional[set] = None,
+    authorization=None,
+    with_types: bool = True,
+) -> dict:
+    """Fetch a document and extract its types and entities with the configured parse backend.
+
+    With PARSE_BACKEND=process the document is parsed in a worker process and
+    only the extracted results are sent back; parsing taking longer than
+    PARSE_TIMEOUT is aborted. Documents larger than PARSE_MAX_BYTES are
+    rejected in all backends. With SHARED_CACHE_DB set, results are shared
+    with the other workers, keyed by the content hash of the document and the
+    requested parts.
+
+    Args:
+        data_url (str): Url to the semantic document
+        class_list (set, optional): Classes of the entities to extract, None to skip entities
+        authorization (str, optional): Authorization header for HTTP requests
+        with_types (bool, optional): Whether to extract the rdf:type list. Defaults to True.
+
+    Returns:
+        dict: Dict with keys types, entities and base_namespace, None for skipped parts
+    """
+    data_data, data_name = open_file(data_url, authorization)
+    check_parse_size(data_data, data_url)
+    format = guess_data_format(data_url)
+    if shared_cache is None:
+        return parse_document(data_data, format, data_url, class_list, with_types)
+    key = cache.content_hash(
+        json.dumps(
+            [
+                cache.content_hash(data_data),
+                data_url,
+                format,
+                sorted(map(str, class_list)) if class_list is not None else None,
+                with_types,
+            ]
+        ).encode()
+    )
+    result = shared_cache.get_result(key)
+    if result is None:
+        result = parse_document(data_data, format, data_url, class_list, with_types)
+        shared_cache.put_result(key, result)
+    return result
+
+
+def parse_document(
+    data_data: bytes,
+    format: str,
+    data_url: str,
+    class_list: Optional[set] = None,
+    with_types: bool = True,
+) -> dict:
+    """analyze_data in the configured parse backend, see analyze_document."""
+    if PARSE_BACKEND != "process":
+        return analyze_data(data_data, format, data_url, class_list, with_types)
+    try:
+        # stages inside the worker are not recorded, the wait covers all of them
+        with metrics.stage("parse_process"):
+            return get_process_pool().run(
+                analyze_data,
+                (data_data, format, data_url, class_list, with_types),
+                PARSE_TIMEOUT,
+            )
+    except TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail="parsing {} took longer than {} seconds".format(
+                data_url, PARSE_TIMEOUT
+            ),
+        )
+    except workers.WorkerDied:
+        raise HTTPException(
+            status_code=500, detail="parse worker died while parsing {}".format(data_url)
+        )
+
+
+def get_all_types(data_url: str, authorization=None) -> List[str]:
+    """Get all unique rdf:type values from a semantic document.
+    
+    Args:
+        data_url: URL to the semantic document
+        authorization: Authorization header for HTTP requests
+    
+    Returns:
+        List of full IRI strings for all types found
+    """
+    return flights["types"].do(
+        (str(data_url), authorization), _get_all_types, data_url, authorization
+    )
+
+
+def _get_all_types(data_url: str, authorization=None) -> List[str]:
+    logging.info("Extracting all rdf:type values from: {}".format(data_url))
+    type_list = analyze_document(data_url, None, authorization)["types"]
+    logging.info("Found {} unique types: {}".format(len(type_list), type_list))
+    
+    return type_list
+
+
+def query_entities(
+    data_url: str,
+    entity_classes: List[URIRef],
+    authorization=None,
+    include_subclasses: bool = False,
+) -> dict:
+    """Get all named individuals at data_url location that are of any type in entity_classes.
+
+    Args:
+        data_url (AnyUrl): Url to metadata to use
+        entity_classes (List[URIRef]): List of rdflib URIRef as class types to query for.
+        include_subclasses (bool, optional): Also match individuals typed with a subclass of entity_classes, resolved with the subclass index. Defaults to False.
+
+    Returns:
+        dict: Dict with short entity IRI as key
+    """
+    key = (
+        str(data_url),
+        authorization,
+        tuple(sorted(map(str, entity_classes))),
+        include_subclasses,
+    )
+    return flights["entities"].do(
+        key, _query_entities, data_url, entity_classes, authorization, include_subclasses
+    )
+
+
+def _query_entities(
+    data_url: str,
+    entity_classes: List[URIRef],
+    authorization=None,
+    include_subclasses: bool = False,
+) -> Tuple[dict, str]:
+    class_list = resolve_classes(entity_classes, include_subclasses, authorization)
+    logging.info(
+        "query data at url: {}\nfor entity classes: {}".format(data_url, class_list)
+    )
+    result = analyze_document(data_url, class_list, authorization, with_types=False)
+    return result["entities"], result["base_namespace"]
+
+
+def inspect_document(
+    data_url: str,
+    entity_classes: List[URIRef],
+    authorization=None,
+    include_subclasses: bool = False,
+) -> dict:
+    """Get the types and the entities of the given classes of a document from a single parse.
+
+    Args:
+        data_url (str): Url to the semantic document
+        entity_classes (List[URIRef]): Classes of the entities to return, may be empty
+        authorization (str, optional): Authorization header for HTTP requests
+        include_subclasses (bool, optional): Also match individuals typed with a subclass of entity_classes. Defaults to False.
+
+    Returns:
+        dict: Dict with keys types (list of rdf:type IRIs), entities and base_namespace
+    """
+    class_list = resolve_classes(entity_classes, include_subclasses, authorization)
+    return analyze_document(data_url, class_list, authorization)
+
+
+def get_entity_index(
+    data_url: str,
+    entity_classes: List[URIRef],
+    authorization=None,
+    include_subclasses: bool = False,
+) -> entity_index.EntityIndex:
+    """Index of the entities of the given classes in a document, cached per document content.
+
+    Args:
+        data_url (str): Url to the semantic document
+        entity_classes (List[URIRef]): Classes of the entities to index
+        authorization (str, optional): Authorization header for HTTP requests
+        include_subclasses (bool, optional): Also index individuals typed with a subclass of entity_classes. Defaults to False.
+
+    Returns:
+        entity_index.EntityIndex: Index of the entities
+    """
+    data_data, data_name = open_file(data_url, authorization)
+    key = (
+        cache.content_hash(data_data),
+        data_url,
+        tuple(sorted(map(str, entity_classes))),
+        include_subclasses,
+    )
+    index = entity_index_cache.get(key)
+    if index is None:
+        entities, base_ns = query_entities(
+            data_url, entity_classes, authorization, include_subclasses
+        )
+        index = entity_index.EntityIndex(entities, base_ns)
+        entity_index_cache.put(key, index)
+    return index
+
+
+def lookup_reference(field: str) -> str:
+    """Yarrrml reference to the data field an entity is looked up by."""
+    lookup_property = "$({})".format(field)
+    if lookup_property == "$(title)":
+        lookup_property = "$(titles)"
+    return lookup_property
+
+
+def mapping_rule(
+    ice_key: str, subject: dict, source_name: str, mapping_predicate_uri: URIRef
+) -> OrderedDict:
+    """Yarrrml rule linking the data record of subject to the template entity ice_key.
+
+    Args:
+        ice_key (str): Name of the template entity
+        subject (dict): Data subject with lookup property and text
+        source_name (str): Yarrrml source iterating over the records holding the property
+        mapping_predicate_uri (URIRef): Object property to use as predicate to link
+
+    Returns:
+        OrderedDict: Mapping rule
+    """
+    return OrderedDict(
+        {
+            "sources": [source_name],
+            "s": "$(@id)",
+            "condition": {
+                "function": "equal",
+                "parameters": [
+                    ["str1", lookup_reference(subject["property"])],
+                    ["str2", str(subject["text"])],
+                ],
+            },
+            "po": [
+                [str(mapping_predicate_uri), "template:" + ice_key + "~iri"],
+            ],
+        }
+    )
+
+
+def mapping_filename(data_url: str) -> str:
+    """Suggested file name of the mapping of the data at data_url."""
+    return data_url.rsplit("/", 1)[-1].rsplit(".", 1)[0].rsplit("-", 1)[0] + "-map.yaml"
+
+
 def get_mapping_output(
     data_url: str,
     use_template_rowwise: bool,
@@ -495,6 +1503,8 @@ def get_mapping_output(
     subjects_dict: dict,
     mapping_predicate_uri: URIRef,
     authorization=None,
+    iterators: Optional[Dict[str, Tuple[str, str]]] = None,
+    lazy: bool = False,
 ) -> dict:
     """Generate YARRRML mapping rules linking data to template.
 
@@ -507,6 +1517,11 @@ def get_mapping_output(
         subjects_dict (dict): Dict of data subjects with short entity IRI as key
         mapping_predicate_uri (URIRef): Object property to use as predicate to link
         authorization (str, optional): Authorization header for HTTP requests
+        iterators (dict, optional): Already discovered (iterator, source name) per lookup field, the data document is only loaded for fields missing here
+        lazy (bool, optional): Return the mappings section as generator of (template entity name, rule) pairs, created while consumed, e.g. by iter_dump_mapping. Defaults to False.
+
+    Raises:
+        ValueError: If a mapped data subject has no text
 
     Returns:
         dict: Dict with 'filename' (suggested mapping filename) and 'filedata' (YARRRML yaml content)
@@ -526,6 +1541,9 @@ def get_mapping_output(
     for ice_key, il_id in map_list:
         _il = subjects_dict.get(il_id, None)
         if _il and "property" in _il:
+            # checked now, rules of a lazy mappings section are only created while serialized
+            if "text" not in _il:
+                raise ValueError("data subject {} has no text to look it up by".format(il_id))
             field = _il["property"]
             if field not in field_to_mappings:
                 field_to_mappings[field] = []
@@ -535,8 +1553,14 @@ def get_mapping_output(
     sources = OrderedDict()
     field_to_source = {}
     
+    iterators = dict(iterators or {})
+    missing_fields = [field for field in field_to_mappings if field not in iterators]
+    if missing_fields:
+        iterators.update(
+            find_jsonpath_iterators(load_json(data_url, authorization), missing_fields)
+        )
     for field in field_to_mappings.keys():
-        iterator, source_name = find_jsonpath_iterator(data_url, field, authorization)
+        iterator, source_name = iterators[field]
         sources[source_name] = {
             "access": str(data_url),
             "iterator": iterator,
@@ -546,41 +1570,307 @@ def get_mapping_output(
     
     result["sources"] = sources
     result["use_template_rowwise"] = str(use_template_rowwise).lower()
-    result["mappings"] = OrderedDict()
     
-    print(subjects_dict)
     logging.debug(subjects_dict)
     
     # Generate mappings with correct source assignment
-    for field, mappings in field_to_mappings.items():
-        source_name = field_to_source[field]
-        for ice_key, il_id, _il in mappings:
-            logging.debug("{} {} {}".format(ice_key, il_id, _il))
-            
-            lookup_property = "$({})".format(_il["property"])
-            if lookup_property == "$(title)":
-                lookup_property = "$(titles)"
-            compare_string = str(_il["text"])
-
-            result["mappings"][ice_key] = OrderedDict(
-                {
-                    "sources": [source_name],
-                    "s": "$(@id)",
-                    "condition": {
-                        "function": "equal",
-                        "parameters": [
-                            ["str1", lookup_property],
-                            ["str2", compare_string],
-                        ],
-                    },
-                    "po": [
-                        [str(mapping_predicate_uri), "template:" + ice_key + "~iri"],
-                    ],
-                }
-            )
+    def rules():
+        for field, mappings in field_to_mappings.items():
+            source_name = field_to_source[field]
+            for ice_key, il_id, _il in mappings:
+                logging.debug("{} {} {}".format(ice_key, il_id, _il))
+                yield ice_key, mapping_rule(
+                    ice_key, _il, source_name, mapping_predicate_uri
+                )
+
+    result["mappings"] = rules() if lazy else OrderedDict(rules())
     
-    filename = (
-        data_url.rsplit("/", 1)[-1].rsplit(".", 1)[0].rsplit("-", 1)[0] + "-map.yaml"
-    )
+    filename = mapping_filename(data_url)
     data = result
     return {"filename": filename, "filedata": data}
+
+
+def dump_mapping(mapping: dict, format: str = "yaml") -> str:
+    """Serialize a yarrrml mapping.
+
+    Yaml is emitted by libyaml if available and all scalars are ones it
+    writes identically to the pure python emitter, otherwise by the python
+    emitter. Json is written directly by the json module.
+
+    Args:
+        mapping (dict): Mapping as created by get_mapping_output
+        format (str, optional): yaml or json. Defaults to "yaml".
+
+    Returns:
+        str: Serialized mapping
+    """
+    with metrics.stage("serialization"):
+        return _dump_mapping(mapping, format)
+
+
+def _dump_mapping(mapping: dict, format: str) -> str:
+    if format == "json":
+        return json.dumps(mapping, indent=2, ensure_ascii=False) + "\n"
+    dumper = MappingDumper if MappingDumper is not Dumper and c_emitter_safe(mapping) else Dumper
+    return dump(mapping, Dumper=dumper, allow_unicode=True)
+
+
+def iter_dump_mapping(mapping: dict, format: str = "yaml") -> Iterator[str]:
+    """Serialize a yarrrml mapping in chunks, one per top level section and mapping rule.
+
+    The joined chunks equal the output of dump_mapping, but no more than one
+    rule is serialized at a time.
+
+    Args:
+        mapping (dict): Mapping as created by get_mapping_output, its mappings section may be a generator of (name, rule) pairs
+        format (str, optional): yaml or json. Defaults to "yaml".
+
+    Yields:
+        str: Serialized parts of the mapping
+    """
+    # recorded as one serialization, without the time the consumer takes between chunks
+    return metrics.timed_iter("serialization", _iter_dump_mapping(mapping, format))
+
+
+def _iter_dump_mapping(mapping: dict, format: str) -> Iterator[str]:
+    if format == "json":
+        yield "{"
+    for position, (key, value) in enumerate(mapping.items()):
+        if format == "json":
+            yield "," if position else ""
+            yield "\n  {}: ".format(json.dumps(key))
+        if key != "mappings":
+            if format == "json":
+                yield json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+            else:
+                yield _dump_mapping(OrderedDict([(key, value)]), format)
+            continue
+        rules = iter(value.items() if isinstance(value, dict) else value)
+        first = next(rules, None)
+        if first is None:
+            yield "{}" if format == "json" else _dump_mapping(OrderedDict([(key, {})]), format)
+            continue
+        yield "{" if format == "json" else key + ":\n"
+        for index, (name, rule) in enumerate(itertools.chain([first], rules)):
+            if format == "json":
+                yield "{}\n    {}: {}".format(
+                    "," if index else "",
+                    json.dumps(name, ensure_ascii=False),
+                    json.dumps(rule, indent=2, ensure_ascii=False).replace("\n", "\n    "),
+                )
+            else:
+                # the rule nested under its section, without the section line
+                chunk = _dump_mapping(
+                    OrderedDict([(key, OrderedDict([(name, rule)]))]), format
+                )
+                yield chunk.split("\n", 1)[1]
+        if format == "json":
+            yield "\n  }"
+    if format == "json":
+        yield "\n}\n" if mapping else "}\n"
+
+
+def load_mapping(text: str) -> OrderedDict:
+    """Parse a yarrrml mapping as written by Mapper.to_pretty_yaml.
+
+    Raises:
+        ValueError: If text is no yaml mapping
+    """
+    try:
+        mapping = load(text, Loader=MappingLoader)
+    except Exception as err:
+        raise ValueError("invalid mapping: {}".format(err))
+    if not isinstance(mapping, dict):
+        raise ValueError("invalid mapping: no yaml mapping")
+    return mapping
+
+
+def patch_mapping_output(
+    mapping: dict,
+    delta: Dict[str, Optional[str]],
+    subjects_dict: dict,
+    mapping_predicate_uri: Optional[URIRef] = None,
+    data_url: Optional[str] = None,
+    authorization=None,
+    iterators: Optional[Dict[str, Tuple[str, str]]] = None,
+) -> dict:
+    """Apply changed assignments to a mapping created by get_mapping_output.
+
+    Prefixes, sources and the rules of unchanged entities are kept. Only the
+    rules of the entities in delta are rebuilt, and iterators are only
+    discovered for lookup fields no existing source covers. Sources no rule
+    refers to anymore are dropped.
+
+    Args:
+        mapping (dict): Previously generated yarrrml mapping
+        delta (Dict[str, Optional[str]]): Template entity names with their new data subject ID, None to remove the rule
+        subjects_dict (dict): Dict of data subjects with short entity IRI as key
+        mapping_predicate_uri (URIRef, optional): Object property to link with. Defaults to the one of the existing rules.
+        data_url (str, optional): URL to the data metadata. Defaults to the access of the existing sources.
+        authorization (str, optional): Authorization header for HTTP requests
+        iterators (dict, optional): Already discovered (iterator, source name) per lookup field
+
+    Raises:
+        HTTPException: 400 listing the ids of delta that are no data subject with a lookup property
+
+    Returns:
+        dict: Dict with 'filename' (suggested mapping filename) and 'filedata' (patched YARRRML content)
+    """
+    result = OrderedDict(mapping)
+    sources = OrderedDict(result.get("sources") or {})
+    rules = OrderedDict(result.get("mappings") or {})
+    if data_url is None:
+        data_url = next((source["access"] for source in sources.values()), None)
+    if data_url is None:
+        raise ValueError("mapping has no sources, data_url is required")
+    # recover the source and predicate of every lookup field from the existing rules
+    reference_to_source = {}
+    for rule in rules.values():
+        reference = dict(rule["condition"]["parameters"])["str1"]
+        reference_to_source.setdefault(reference, rule["sources"][0])
+        if mapping_predicate_uri is None:
+            mapping_predicate_uri = URIRef(rule["po"][0][0])
+    if mapping_predicate_uri is None:
+        mapping_predicate_uri = ContentToBearingRelation
+
+    unknown = [
+        il_id for il_id in delta.values()
+        if il_id and "property" not in (subjects_dict.get(il_id) or {})
+    ]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail="unknown data subject ids: {}".format(", ".join(map(str, unknown))),
+        )
+    changed = {}
+    for ice_key, il_id in delta.items():
+        if il_id:
+            changed[ice_key] = subjects_dict[il_id]
+        else:
+            rules.pop(ice_key, None)
+    iterators = dict(iterators or {})
+    missing_fields = [
+        _il["property"]
+        for _il in changed.values()
+        if lookup_reference(_il["property"]) not in reference_to_source
+        and _il["property"] not in iterators
+    ]
+    if missing_fields:
+        iterators.update(
+            find_jsonpath_iterators(load_json(data_url, authorization), missing_fields)
+        )
+    for ice_key, _il in changed.items():
+        reference = lookup_reference(_il["property"])
+        if reference not in reference_to_source:
+            iterator, source_name = iterators[_il["property"]]
+            sources[source_name] = {
+                "access": str(data_url),
+                "iterator": iterator,
+                "referenceFormulation": "jsonpath",
+            }
+            reference_to_source[reference] = source_name
+        rules[ice_key] = mapping_rule(
+            ice_key, _il, reference_to_source[reference], mapping_predicate_uri
+        )
+
+    used_sources = {rule["sources"][0] for rule in rules.values()}
+    result["sources"] = OrderedDict(
+        (name, source) for name, source in sources.items() if name in used_sources
+    )
+    result["mappings"] = rules
+    return {"filename": mapping_filename(data_url), "filedata": result}
+
+
+# executor running blocking fetch and parse work off the event loop
+executor = ThreadPoolExecutor(
+    max_workers=EXECUTOR_WORKERS, thread_name_prefix="maptomethod"
+)
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """Run a blocking function in the executor without blocking the event loop.
+
+    The context of the caller is copied into the worker thread.
+
+    Args:
+        func (callable): Function to run
+
+    Returns:
+        Any: Return value of func
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(ctx.run, func, *args, **kwargs)
+    )
+
+
+async def aquery_entities(
+    data_url: str,
+    entity_classes: List[URIRef],
+    authorization=None,
+    include_subclasses: bool = False,
+) -> Tuple[dict, str]:
+    """Awaitable query_entities, fetching and parsing in the executor."""
+    return await run_in_executor(
+        query_entities, data_url, entity_classes, authorization, include_subclasses
+    )
+
+
+async def ainspect_document(
+    data_url: str,
+    entity_classes: List[URIRef],
+    authorization=None,
+    include_subclasses: bool = False,
+) -> dict:
+    """Awaitable inspect_document, fetching and parsing in the executor."""
+    return await run_in_executor(
+        inspect_document, data_url, entity_classes, authorization, include_subclasses
+    )
+
+
+async def aget_entity_index(
+    data_url: str,
+    entity_classes: List[URIRef],
+    authorization=None,
+    include_subclasses: bool = False,
+) -> entity_index.EntityIndex:
+    """Awaitable get_entity_index, fetching and parsing in the executor."""
+    return await run_in_executor(
+        get_entity_index, data_url, entity_classes, authorization, include_subclasses
+    )
+
+
+async def aget_all_types(data_url: str, authorization=None) -> List[str]:
+    """Awaitable get_all_types, fetching and parsing in the executor."""
+    return await run_in_executor(get_all_types, data_url, authorization)
+
+
+async def acreate_mapper(**kwargs) -> Mapper:
+    """Awaitable Mapper construction, querying both documents concurrently in the executor.
+
+    Takes the keyword arguments of Mapper. Subjects and objects not given are
+    queried in parallel before the Mapper is created.
+
+    Returns:
+        Mapper: Mapper with populated subjects and objects
+    """
+    authorization = kwargs.get("authorization")
+    pending = {}
+    if kwargs.get("objects") is None:
+        pending["objects"] = aquery_entities(
+            kwargs["template_url"],
+            kwargs.get("template_object_types", [InformtionContentEntity, TemporalRegionClass]),
+            authorization,
+        )
+    if kwargs.get("subjects") is None:
+        pending["subjects"] = aquery_entities(
+            kwargs["data_url"],
+            kwargs.get("data_subject_types", [OA.Annotation, CSVW.Column]),
+            authorization,
+        )
+    results = dict(zip(pending.keys(), await asyncio.gather(*pending.values())))
+    for key, (entities, base_ns) in results.items():
+        kwargs[key] = entities
+        kwargs["base_ns_" + key] = base_ns
+    return Mapper(**kwargs)
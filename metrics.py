@@ -0,0 +1,339 @@
+import bisect
+import contextlib
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import profiling
+
+# seconds, from cache hits to large documents parsed with rdflib
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+# bytes, 1 KiB to 256 MiB in steps of 4
+SIZE_BUCKETS = tuple(1024 * 4**i for i in range(10))
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        """Metric family with one value per combination of label values.
+
+        Args:
+            name (str): Metric name
+            help (str): Description shown in the exposition
+            labelnames (Iterable[str], optional): Names of the labels. Defaults to no labels.
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                "{} expects labels {}, got {}".format(self.name, self.labelnames, sorted(labels))
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, dict, float]]:
+        """(sample name, labels, value) triples of all label combinations."""
+        with self._lock:
+            return [
+                (self.name, dict(zip(self.labelnames, key)), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        """Histogram with cumulative buckets, a sum and a count per label combination.
+
+        Args:
+            name (str): Metric name
+            help (str): Description shown in the exposition
+            labelnames (Iterable[str], optional): Names of the labels. Defaults to no labels.
+            buckets (Iterable[float], optional): Upper bounds of the buckets. Defaults to LATENCY_BUCKETS.
+        """
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # counts per bucket plus one for +Inf, sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def samples(self) -> List[Tuple[str, dict, float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    samples.append(
+                        (self.name + "_bucket", dict(labels, le=format_value(float(bound))), cumulative)
+                    )
+                samples.append((self.name + "_sum", labels, total))
+                samples.append((self.name + "_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        """Metrics of the process and collectors adding metrics computed at scrape time."""
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """Add a function returning metrics filled on every scrape, e.g. from cache statistics."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self) -> List[Metric]:
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            metrics.extend(collector())
+        return metrics
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format 0.0.4."""
+        lines = []
+        for metric in self.collect():
+            lines.append("# HELP {} {}".format(metric.name, metric.help.replace("\n", " ")))
+            lines.append("# TYPE {} {}".format(metric.name, metric.type))
+            for name, labels, value in metric.samples():
+                lines.append("{}{} {}".format(name, format_labels(labels), format_value(value)))
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+stage_seconds = registry.register(
+    Histogram(
+        "maptomethod_stage_duration_seconds",
+        "Time spent in a stage of creating a mapping.",
+        ["stage"],
+    )
+)
+stage_in_progress = registry.register(
+    Gauge(
+        "maptomethod_stage_in_progress",
+        "Number of stage runs in progress.",
+        ["stage"],
+    )
+)
+stage_errors = registry.register(
+    Counter(
+        "maptomethod_stage_errors_total",
+        "Number of stage runs ended by an exception.",
+        ["stage"],
+    )
+)
+document_bytes = registry.register(
+    Histogram(
+        "maptomethod_document_bytes",
+        "Size of the fetched documents.",
+        ["scheme"],
+        buckets=SIZE_BUCKETS,
+    )
+)
+http_in_flight = registry.register(
+    Gauge(
+        "maptomethod_http_requests_in_flight",
+        "Number of http requests being handled, until their response is sent completely.",
+        ["handler"],
+    )
+)
+http_seconds = registry.register(
+    Histogram(
+        "maptomethod_http_request_duration_seconds",
+        "Time to handle a http request and send its response.",
+        ["handler", "method", "status"],
+    )
+)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record the duration of the enclosed block as a run of stage name.
+
+    Stages may be nested, every stage records its full duration including
+    enclosed stages. In a profiled request the stage is also marked in the
+    profile, at the frame of the caller.
+
+    Args:
+        name (str): Stage, e.g. fetch or parse
+    """
+    profile = profiling.active.get()
+    if profile is not None:
+        # frames: this generator, contextlib __enter__, the with statement
+        profile.enter(name, sys._getframe(2))
+    stage_in_progress.inc(stage=name)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage=name)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=name)
+        stage_in_progress.dec(stage=name)
+        if profile is not None:
+            profile.exit(name)
+
+
+def timed_iter(name: str, chunks: Iterable) -> Iterator:
+    """Pass chunks through and record the time spent creating them as one run of stage name.
+
+    Time the consumer spends between chunks, e.g. sending them to a client, is not included.
+
+    Args:
+        name (str): Stage, e.g. yaml_serialization
+        chunks (Iterable): Lazily created chunks
+    """
+    chunks = iter(chunks)
+    elapsed = 0.0
+    failed = False
+    # chunks may be requested from different threads, each one is marked while creating its chunk
+    profile = profiling.active.get()
+    try:
+        while True:
+            if profile is not None:
+                profile.enter(name, sys._getframe(0))
+            start = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                elapsed += time.perf_counter() - start
+                if profile is not None:
+                    profile.exit(name)
+            yield chunk
+    finally:
+        if failed:
+            stage_errors.inc(stage=name)
+        stage_seconds.observe(elapsed, stage=name)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        """ASGI middleware recording in flight requests and request durations per route.
+
+        Requests are labeled with the path of the matching route, so path
+        parameters and unknown paths do not create new label values.
+
+        Args:
+            app: ASGI application to wrap
+        """
+        self.app = app
+
+    def handler(self, scope) -> str:
+        router = getattr(scope.get("app"), "router", None)
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match.name == "FULL":
+                return getattr(route, "path", "other")
+        return "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        handler = self.handler(scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_in_flight.inc(handler=handler)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(handler=handler)
+            http_seconds.observe(
+                time.perf_counter() - start,
+                handler=handler,
+                method=scope["method"],
+                status=status["code"],
+            )
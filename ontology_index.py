@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from rdflib import Graph, URIRef
+from rdflib.namespace import RDFS
+
+
+def build_closure(graph: Graph) -> Dict[str, List[str]]:
+    """Transitive closure of rdfs:subClassOf.
+
+    Args:
+        graph (Graph): Ontology graph
+
+    Returns:
+        Dict[str, List[str]]: All descendants of every class that has subclasses, sorted, without the class itself
+    """
+    children = {}
+    for child, parent in graph.subject_objects(RDFS.subClassOf):
+        if isinstance(child, URIRef) and isinstance(parent, URIRef) and child != parent:
+            children.setdefault(str(parent), set()).add(str(child))
+    closure = {}
+    for parent in children:
+        seen = set()
+        queue = deque(children[parent])
+        while queue:
+            child = queue.popleft()
+            if child in seen:
+                continue
+            seen.add(child)
+            queue.extend(children.get(child, ()))
+        seen.discard(parent)
+        closure[parent] = sorted(seen)
+    return closure
+
+
+class SubclassIndex:
+    def __init__(self, index_dir: Optional[str], loader: Callable[[str], Graph]):
+        """Precomputed subclass closures of registered ontologies.
+
+        The closure of an ontology is built on first use from the graph returned
+        by loader and persisted as json in index_dir, so later lookups and
+        restarts neither download nor parse the ontology again.
+
+        Args:
+            index_dir (str, optional): Directory to persist closures in, None to keep them in memory only
+            loader (Callable[[str], Graph]): Function returning the ontology graph of a registry key
+        """
+        self.index_dir = index_dir
+        self.loader = loader
+        self._closures = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.index_dir, key + ".json")
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def closure(self, key: str) -> Dict[str, frozenset]:
+        """Closure of the ontology registered at key, loaded or built on first use.
+
+        Args:
+            key (str): Key of the ontology in the registry
+
+        Returns:
+            Dict[str, frozenset]: All descendants of every class with subclasses
+        """
+        closure = self._closures.get(key)
+        if closure is not None:
+            return closure
+        with self._key_lock(key):
+            closure = self._closures.get(key)
+            if closure is None:
+                closure = self._read(key)
+                if closure is None:
+                    closure = self.build(key)
+                self._closures[key] = closure
+        return closure
+
+    def build(self, key: str) -> Dict[str, frozenset]:
+        """(Re)build and persist the closure of the ontology registered at key.
+
+        Args:
+            key (str): Key of the ontology in the registry
+
+        Returns:
+            Dict[str, frozenset]: All descendants of every class with subclasses
+        """
+        logging.info("building subclass index of ontology {}".format(key))
+        closure = build_closure(self.loader(key))
+        self._write(key, closure)
+        closure = {parent: frozenset(children) for parent, children in closure.items()}
+        self._closures[key] = closure
+        return closure
+
+    def descendants(self, key: str, superclass: URIRef) -> List[URIRef]:
+        """All subclasses of superclass including itself, like rdfs:subClassOf*.
+
+        Args:
+            key (str): Key of the ontology in the registry
+            superclass (URIRef): Class to look up
+
+        Returns:
+            List[URIRef]: superclass followed by its descendants
+        """
+        children = self.closure(key).get(str(superclass), ())
+        return [URIRef(superclass)] + [URIRef(child) for child in sorted(children)]
+
+    def _read(self, key: str) -> Optional[Dict[str, frozenset]]:
+        if not self.index_dir:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                closure = json.load(f)["closure"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return {parent: frozenset(children) for parent, children in closure.items()}
+
+    def _write(self, key: str, closure: Dict[str, List[str]]) -> None:
+        if not self.index_dir:
+            return
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"key": key, "built": time.time(), "closure": closure}, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as err:
+            logging.warning("could not persist subclass index of {}: {}".format(key, err))
@@ -0,0 +1,247 @@
+import contextvars
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() in ("true", "1", "t")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.005))
+PROFILING_MAX_ENTRIES = int(os.getenv("PROFILING_MAX_ENTRIES", 16))
+PROFILING_DIR = os.getenv("PROFILING_DIR") or None
+PROFILING_HEADER = "X-Profile-Token"
+PROFILED_PATHS = ("/api/mapping", "/api/entities", "/create_mapper")
+
+# profile of the request the current context belongs to, only ever set by ProfilingMiddleware
+active = contextvars.ContextVar("profile", default=None)
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return "{} ({}:{})".format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno
+    )
+
+
+class Profile:
+    def __init__(self, method: str, path: str, interval: float):
+        """Samples of the threads working on one request while they run a stage.
+
+        Threads are sampled while they are inside a metrics.stage entered in
+        the context of the request, e.g. in the executor or the threadpool of
+        sync endpoints. Work done in the parse worker processes shows as the
+        waiting parse_process stage.
+
+        Args:
+            method (str): Http method of the request
+            path (str): Path of the request
+            interval (float): Seconds between samples
+        """
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started = time.time()
+        self.duration = None
+        self.status = None
+        self.samples = 0
+        self.stacks = defaultdict(int)
+        self.stage_seconds = defaultdict(float)
+        self.stage_runs = defaultdict(int)
+        # thread id to the stages it is in, each with the frame that entered it
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, name="profile-" + self.id[:8], daemon=True
+        )
+
+    def enter(self, stage: str, frame) -> None:
+        with self._lock:
+            self._threads.setdefault(threading.get_ident(), []).append(
+                (stage, frame, time.perf_counter())
+            )
+
+    def exit(self, stage: str) -> None:
+        thread_id = threading.get_ident()
+        with self._lock:
+            stages = self._threads.get(thread_id)
+            if not stages:
+                return
+            name, _, start = stages.pop()
+            if not stages:
+                del self._threads[thread_id]
+            self.stage_seconds[name] += time.perf_counter() - start
+            self.stage_runs[name] += 1
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self, status: Optional[int] = None) -> None:
+        self._stopped.set()
+        self._sampler.join()
+        self.status = status
+        self.duration = time.time() - self.started
+
+    def _sample_loop(self) -> None:
+        names = {}
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                threads = {
+                    thread_id: {id(frame): stage for stage, frame, _ in stages}
+                    for thread_id, stages in self._threads.items()
+                }
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for thread_id, markers in threads.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                labels = []
+                while frame is not None:
+                    # a stage marker follows the frame that entered the stage
+                    if id(frame) in markers:
+                        labels.append("stage:" + markers[id(frame)])
+                    labels.append(frame_label(frame))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                labels.append("thread:" + names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Samples in the collapsed stack format read by flamegraph.pl, speedscope or inferno."""
+        return "".join(
+            "{} {}\n".format(stack, count) for stack, count in sorted(self.stacks.items())
+        )
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started": self.started,
+            "duration": self.duration,
+            "interval": self.interval,
+            "samples": self.samples,
+            "stages": {
+                stage: {"seconds": seconds, "runs": self.stage_runs[stage]}
+                for stage, seconds in sorted(self.stage_seconds.items())
+            },
+        }
+
+
+class ProfileStore:
+    def __init__(self, max_entries: int, directory: Optional[str] = None):
+        """Finished profiles, the latest max_entries in memory and all of them in directory if set.
+
+        Args:
+            max_entries (int): Maximum number of profiles kept in memory
+            directory (str, optional): Directory to write <id>.folded and <id>.json files to. Defaults to None.
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def put(self, profile: Profile) -> None:
+        entry = {"summary": profile.summary(), "collapsed": profile.collapsed()}
+        with self._lock:
+            self._entries[profile.id] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.directory:
+            with open(os.path.join(self.directory, profile.id + ".folded"), "w") as f:
+                f.write(entry["collapsed"])
+            with open(os.path.join(self.directory, profile.id + ".json"), "w") as f:
+                json.dump(entry["summary"], f, indent=2)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(profile_id)
+        if entry is None and self.directory and profile_id.isalnum():
+            try:
+                with open(os.path.join(self.directory, profile_id + ".folded")) as f:
+                    collapsed = f.read()
+                with open(os.path.join(self.directory, profile_id + ".json")) as f:
+                    entry = {"summary": json.load(f), "collapsed": collapsed}
+            except FileNotFoundError:
+                return None
+        return entry
+
+    def list(self) -> list:
+        with self._lock:
+            return [entry["summary"] for entry in reversed(self._entries.values())]
+
+
+store = ProfileStore(PROFILING_MAX_ENTRIES, PROFILING_DIR)
+
+
+def authorized(token: Optional[str]) -> bool:
+    """Whether token matches PROFILING_TOKEN, always False if profiling is disabled or no token is configured."""
+    if not (PROFILING_ENABLED and PROFILING_TOKEN and token):
+        return False
+    return hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        """ASGI middleware profiling requests to PROFILED_PATHS that send the profiling token.
+
+        Only added to the app if PROFILING_ENABLED is set. The id of the profile
+        is returned in the X-Profile-Id response header.
+
+        Args:
+            app: ASGI application to wrap
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in PROFILED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        token = headers.get(PROFILING_HEADER.lower().encode())
+        if not authorized(token.decode("latin-1") if token else None):
+            await self.app(scope, receive, send)
+            return
+        profile = Profile(scope["method"], scope["path"], PROFILING_INTERVAL)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = dict(
+                    message,
+                    headers=list(message.get("headers", []))
+                    + [
+                        (b"x-profile-id", profile.id.encode()),
+                        (b"access-control-expose-headers", b"X-Profile-Id"),
+                    ],
+                )
+            await send(message)
+
+        reset = active.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            active.reset(reset)
+            profile.stop(status["code"])
+            store.put(profile)
+            logging.info(
+                "profiled {} {} in {:.3f}s with {} samples as {}".format(
+                    profile.method, profile.path, profile.duration, profile.samples, profile.id
+                )
+            )
@@ -0,0 +1,201 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Iterator, Tuple
+
+from rdflib import BNode, Graph, Literal, URIRef
+
+MAGIC = b"M2MSNAP1"
+# magic, byte order, term count, triple count, namespace json bytes, term data bytes
+HEADER = struct.Struct("<8s1sIIII")
+URI, BNODE, LITERAL = 0, 1, 2
+
+
+def encode_term(term) -> Tuple[int, str]:
+    if isinstance(term, Literal):
+        return LITERAL, "{}\0{}\0{}".format(term, term.datatype or "", term.language or "")
+    if isinstance(term, BNode):
+        return BNODE, str(term)
+    return URI, str(term)
+
+
+def decode_term(kind: int, text: str):
+    if kind == LITERAL:
+        value, datatype, language = text.rsplit("\0", 2)
+        return Literal(value, lang=language or None, datatype=datatype or None)
+    if kind == BNODE:
+        return BNode(text)
+    return URIRef(text)
+
+
+def write_snapshot(graph: Graph, path: str) -> None:
+    """Compile a graph into a binary snapshot.
+
+    The snapshot stores every distinct term once in a term dictionary and the
+    triples as an array of term ids, so loading it needs no rdf parser.
+    The file is written atomically.
+
+    Args:
+        graph (Graph): Graph to compile
+        path (str): Snapshot file to write
+    """
+    ids = {}
+    kinds = array("B")
+    offsets = array("I", [0])
+    term_data = bytearray()
+    triples = array("I")
+    for triple in graph:
+        for term in triple:
+            term_id = ids.get(term)
+            if term_id is None:
+                term_id = ids[term] = len(kinds)
+                kind, text = encode_term(term)
+                kinds.append(kind)
+                term_data += text.encode("utf-8")
+                offsets.append(len(term_data))
+            triples.append(term_id)
+    namespaces = json.dumps(
+        [[prefix, str(namespace)] for prefix, namespace in graph.namespaces()]
+    ).encode()
+    byteorder = b"<" if sys.byteorder == "little" else b">"
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(
+                HEADER.pack(
+                    MAGIC,
+                    byteorder,
+                    len(kinds),
+                    len(triples) // 3,
+                    len(namespaces),
+                    len(term_data),
+                )
+            )
+            f.write(namespaces)
+            f.write(kinds.tobytes())
+            # align the uint32 arrays for zero copy casts of the mapped file
+            f.write(b"\0" * (-f.tell() % 4))
+            f.write(offsets.tobytes())
+            f.write(triples.tobytes())
+            f.write(term_data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        """Memory mapped binary snapshot written by write_snapshot.
+
+        Term ids and triples are read straight from the mapped file, terms are
+        only decoded when asked for.
+
+        Args:
+            path (str): Snapshot file
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, n_terms, n_triples, ns_len, data_len = HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != MAGIC:
+            raise ValueError("{} is no snapshot".format(path))
+        view = memoryview(self._mmap)
+        pos = HEADER.size
+        self.namespaces = json.loads(bytes(view[pos : pos + ns_len]))
+        pos += ns_len
+        self._kinds = view[pos : pos + n_terms]
+        pos += n_terms
+        pos += -pos % 4
+        native = byteorder == (b"<" if sys.byteorder == "little" else b">")
+        self._offsets = self._uint32(view[pos : pos + 4 * (n_terms + 1)], native)
+        pos += 4 * (n_terms + 1)
+        self._triples = self._uint32(view[pos : pos + 12 * n_triples], native)
+        pos += 12 * n_triples
+        self._data = view[pos : pos + data_len]
+        self._terms = [None] * n_terms
+        self.n_terms = n_terms
+        self.n_triples = n_triples
+
+    @staticmethod
+    def _uint32(view: memoryview, native: bool):
+        if native:
+            return view.cast("I")
+        swapped = array("I", bytes(view))
+        swapped.byteswap()
+        return swapped
+
+    def __len__(self) -> int:
+        return self.n_triples
+
+    def term(self, term_id: int):
+        term = self._terms[term_id]
+        if term is None:
+            text = str(
+                self._data[self._offsets[term_id] : self._offsets[term_id + 1]],
+                "utf-8",
+            )
+            term = self._terms[term_id] = decode_term(self._kinds[term_id], text)
+        return term
+
+    def term_ids(self) -> Iterator[Tuple[int, int, int]]:
+        """Triples as term ids, without decoding any term."""
+        triples = self._triples
+        for i in range(0, len(triples), 3):
+            yield triples[i], triples[i + 1], triples[i + 2]
+
+    def triples(self) -> Iterator[tuple]:
+        term = self.term
+        for s, p, o in self.term_ids():
+            yield term(s), term(p), term(o)
+
+    def to_graph(self) -> Graph:
+        """Build a rdflib Graph holding all triples and namespace bindings of the snapshot."""
+        graph = Graph()
+        for prefix, namespace in self.namespaces:
+            graph.bind(prefix, namespace, override=True)
+        graph.addN((s, p, o, graph) for s, p, o in self.triples())
+        return graph
+
+    def close(self) -> None:
+        self._kinds.release()
+        self._data.release()
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        if isinstance(self._triples, memoryview):
+            self._triples.release()
+        self._mmap.close()
+
+
+def load_snapshot(path: str) -> Graph:
+    """Load a snapshot into a rdflib Graph.
+
+    Args:
+        path (str): Snapshot file
+
+    Returns:
+        Graph: Graph with the triples of the snapshot
+    """
+    snapshot = Snapshot(path)
+    try:
+        return snapshot.to_graph()
+    finally:
+        snapshot.close()
+
+
+if __name__ == "__main__":
+    # build or refresh the snapshots and subclass indexes of registered ontologies
+    import maptomethod
+
+    keys = sys.argv[1:] or maptomethod.SNAPSHOT_ONTOLOGIES
+    for key in keys:
+        print("refreshing {}".format(key))
+        maptomethod.refresh_ontology(key)
@@ -0,0 +1,295 @@
+import bisect
+import functools
+import heapq
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# splits camel case, digit groups and any non alphanumeric separators
+TOKEN_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+# scores are rounded to 4 digits, bounds allow for the rounding
+SCORE_PRECISION = 0.00005
+# gram weights are summed in units of this share of the largest idf, rounded up
+WEIGHT_STEPS = 64
+# subjects whose sums differ only in this many lowest binary digits are scored together
+LEAF_DIGITS = 4
+
+
+def tokens(text: str) -> List[str]:
+    """Lower case word tokens of a label or entity name.
+
+    Args:
+        text (str): Label or name, e.g. SpecimenWidth or specimen_width
+
+    Returns:
+        List[str]: Tokens, e.g. ["specimen", "width"]
+    """
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def grams(text: str, n: int = 3) -> set:
+    """Character n-grams of the tokens of text, each token padded with spaces.
+
+    Args:
+        text (str): Label or name
+        n (int, optional): Gram length. Defaults to 3.
+
+    Returns:
+        set: Distinct n-grams
+    """
+    result = set()
+    for token in tokens(text):
+        result.update(token_grams(token, n))
+    return result
+
+
+@functools.lru_cache(maxsize=65536)
+def token_grams(token: str, n: int = 3) -> frozenset:
+    """Character n-grams of a lower case token padded with spaces, cached as labels repeat words."""
+    padded = " " + token + " "
+    return frozenset(padded[i : i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+
+def entity_text(name: str, entity: dict) -> str:
+    """Text an entity is matched by, its label followed by its name."""
+    text = entity.get("text") if isinstance(entity, dict) else None
+    return "{} {}".format(text, name) if text else name
+
+
+def add_digits(digits: list, other) -> None:
+    """Add the numbers of other to digits in place, both bit sliced.
+
+    Bit i of digits[k] is binary digit k of the number of subject i, so one
+    int operation adds the numbers of all subjects.
+    """
+    if len(digits) <= len(other):
+        digits.extend([0] * (len(other) + 1 - len(digits)))
+    carry = 0
+    for k, added in enumerate(other):
+        value = digits[k]
+        half = value ^ added
+        digits[k] = half ^ carry
+        carry = (value & added) | (carry & half)
+    k = len(other)
+    while carry:
+        if k == len(digits):
+            digits.append(carry)
+            break
+        value = digits[k]
+        digits[k] = value ^ carry
+        carry &= value
+        k += 1
+
+
+class SuggestionIndex:
+    def __init__(self, subjects: dict):
+        """Inverted n-gram index over the labels of data subjects.
+
+        Grams are weighted by their inverse document frequency, so rare grams
+        decide a match and grams shared by most labels hardly count. Subjects
+        are numbered by their norm, the summed weight of their grams, and the
+        postings of a gram are kept as an int with the bits of its subjects set.
+
+        Args:
+            subjects (dict): Data subjects as returned by query_entities, short entity IRI as key
+        """
+        self.subjects = subjects
+        self.grams = {name: grams(entity_text(name, entity)) for name, entity in subjects.items()}
+        postings = defaultdict(list)
+        for name, subject_grams in self.grams.items():
+            for gram in subject_grams:
+                postings[gram].append(name)
+        count = max(len(subjects), 1)
+        self.idf = {gram: math.log(1 + count / len(names)) for gram, names in postings.items()}
+        # idf of grams no subject has
+        self.default_idf = math.log(1 + count)
+        self.unit = self.default_idf / WEIGHT_STEPS
+        self.units = {gram: math.ceil(weight / self.unit) for gram, weight in self.idf.items()}
+        # the binary digits set in the units of a gram
+        self.unit_digits = {
+            gram: [k for k in range(units.bit_length()) if units >> k & 1]
+            for gram, units in self.units.items()
+        }
+        norms = {
+            name: sum(self.idf[gram] for gram in subject_grams)
+            for name, subject_grams in self.grams.items()
+        }
+        self.names = sorted(norms, key=lambda name: (norms[name], name))
+        self.norms = [norms[name] for name in self.names]
+        position = {name: i for i, name in enumerate(self.names)}
+        self.masks = {}
+        for gram, names in postings.items():
+            mask = bytearray(len(self.names) // 8 + 1)
+            for name in names:
+                i = position[name]
+                mask[i >> 3] |= 1 << (i & 7)
+            self.masks[gram] = int.from_bytes(mask, "little")
+        self.token_units = {}
+
+    def units_of(self, token: str) -> tuple:
+        """Bit sliced units of the grams of token each subject has, cached as labels repeat words."""
+        units = self.token_units.get(token)
+        if units is None:
+            found = [gram for gram in token_grams(token) if gram in self.masks]
+            # enough digits for the sum of all units, so carries always end
+            digits = [0] * sum(self.units[gram] for gram in found).bit_length()
+            for gram in found:
+                mask = self.masks[gram]
+                for i in self.unit_digits[gram]:
+                    carry = mask
+                    while carry:
+                        value = digits[i]
+                        digits[i] = value ^ carry
+                        carry &= value
+                        i += 1
+            units = self.token_units[token] = tuple(digits)
+        return units
+
+    def query(self, text: str, limit: int = 5, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """Subjects with labels similar to text, best first.
+
+        The score is the idf weighted dice coefficient of the n-grams of text
+        and the subject label, 1.0 for identical gram sets. The weight every
+        subject shares with text, rounded up to WEIGHT_STEPS units, is summed
+        for all subjects at once into binary digits, one int per digit. The
+        subjects are then split digit by digit, largest sums first, and scored
+        exactly, keeping the limit best scores in a heap. Subjects which can
+        not beat the limit-th best score by their sum and norm are masked out,
+        which ends the search early as they are numbered by norm.
+
+        Args:
+            text (str): Label or name to match
+            limit (int, optional): Maximum number of candidates. Defaults to 5.
+            min_score (float, optional): Smallest score of a candidate. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[str, float]]: Pairs of subject name and score
+        """
+        query_grams = grams(text)
+        query_norm = sum(self.idf.get(gram, self.default_idf) for gram in query_grams)
+        if not query_norm or limit < 1:
+            return []
+        # grams shared by several tokens are counted again, a bound is all that is needed
+        digits = []
+        for token in set(tokens(text)):
+            add_digits(digits, self.units_of(token))
+        matched = 0
+        for mask in digits:
+            matched |= mask
+        # rounded scores equal to the threshold may still win by name
+        threshold = min_score - SCORE_PRECISION
+        # the limit best scores so far, the smallest one first
+        best = []
+        scored = []
+        idf = self.idf
+        norms = self.norms
+
+        def limits(threshold):
+            # units a subject must share to reach threshold at its best norm, which equals
+            # the shared weight, the mask of the subjects not too small for threshold, and
+            # the factor giving the largest norm allowed for a shared weight
+            needed = threshold * query_norm / (2 - threshold)
+            small = -(1 << bisect.bisect_left(norms, needed))
+            return needed / self.unit, small, 2 / threshold if threshold > 0 else math.inf
+
+        needed, small, factor = limits(threshold)
+        # subjects split by their digits from the highest, larger sums popped first
+        stack = [(matched, len(digits) - 1, 0)]
+        while stack:
+            subjects, digit, units = stack.pop()
+            # most units a subject left may share
+            upper = units + (1 << digit + 1) - 1
+            if upper < needed:
+                break
+            largest = factor * upper * self.unit - query_norm
+            subjects &= small & ((1 << bisect.bisect_right(norms, largest)) - 1)
+            if not subjects:
+                continue
+            if digit >= LEAF_DIGITS:
+                ones = subjects & digits[digit]
+                if ones != subjects:
+                    stack.append((subjects ^ ones, digit - 1, units))
+                if ones:
+                    stack.append((ones, digit - 1, units | 1 << digit))
+                continue
+            while subjects:
+                lowest = subjects & -subjects
+                subjects ^= lowest
+                i = lowest.bit_length() - 1
+                name = self.names[i]
+                shared_weight = sum(map(idf.__getitem__, query_grams & self.grams[name]))
+                score = round(2 * shared_weight / (query_norm + norms[i]), 4)
+                if score < min_score:
+                    continue
+                scored.append((name, score))
+                if len(best) < limit:
+                    heapq.heappush(best, score)
+                else:
+                    heapq.heappushpop(best, score)
+                if len(best) == limit and best[0] - SCORE_PRECISION > threshold:
+                    threshold = best[0] - SCORE_PRECISION
+                    needed, small, factor = limits(threshold)
+                    largest = factor * upper * self.unit - query_norm
+                    subjects &= small & ((1 << bisect.bisect_right(norms, largest)) - 1)
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+
+def suggest(
+    objects: dict,
+    subjects: dict,
+    limit: int = 5,
+    min_score: float = 0.3,
+) -> Dict[str, object]:
+    """Propose a maplist pairing template objects with data subjects by label similarity.
+
+    Every template object is looked up in an inverted n-gram index over the
+    data subjects, which sums the shared gram weights of all subjects with a
+    few int operations and scores only the subjects which can still be among
+    the best, so the cost does not grow with the product of both entity
+    counts. Subjects without a label
+    property are not suggested. The maplist assigns each subject to at most
+    one object, taking the best scored pairs first.
+
+    Args:
+        objects (dict): Template objects as returned by query_entities
+        subjects (dict): Data subjects as returned by query_entities
+        limit (int, optional): Maximum number of ranked candidates per object. Defaults to 5.
+        min_score (float, optional): Smallest score of a candidate. Defaults to 0.3.
+
+    Returns:
+        dict: Dict with maplist (list of [object name, subject name]) and candidates
+        (object name to list of dicts with subject, text and score)
+    """
+    # only subjects with a label property can be mapped, get_mapping_output drops the others
+    subjects = {
+        name: entity
+        for name, entity in subjects.items()
+        if isinstance(entity, dict) and entity.get("property")
+    }
+    index = SuggestionIndex(subjects)
+    candidates = {}
+    pairs = []
+    for name, entity in objects.items():
+        ranked = index.query(entity_text(name, entity), limit, min_score)
+        candidates[name] = [
+            {
+                "subject": subject,
+                "text": subjects[subject].get("text"),
+                "score": score,
+            }
+            for subject, score in ranked
+        ]
+        pairs.extend((score, name, subject) for subject, score in ranked)
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    maplist = []
+    assigned_objects = set()
+    assigned_subjects = set()
+    for score, name, subject in pairs:
+        if name in assigned_objects or subject in assigned_subjects:
+            continue
+        assigned_objects.add(name)
+        assigned_subjects.add(subject)
+        maplist.append([name, subject])
+    return {"maplist": maplist, "candidates": candidates}
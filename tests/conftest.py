@@ -0,0 +1,46 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# the app mounts ./static and ./templates, start where a worker would
+os.chdir(ROOT)
+
+import app
+from benchmarks import generators
+
+# mapping without rules, as a mapping of a document without assignments
+MAPPING = "prefixes:\n  data: https://example.org/data/\nsources: {}\nmappings: {}\n"
+
+
+def client() -> httpx.AsyncClient:
+    """Client sending requests directly to the app, without a server."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test")
+
+
+def request(method: str, path: str, **kwargs) -> httpx.Response:
+    """Send one request to the app, kwargs as for httpx.AsyncClient.request."""
+
+    async def send():
+        async with client() as session:
+            return await session.request(method, path, **kwargs)
+
+    return asyncio.run(send())
+
+
+def write_metadata(directory, columns: int = 5) -> str:
+    """Write a generated data-metadata.json with columns to directory and return its file url."""
+    with open(os.path.join(directory, "data-metadata.json"), "w") as f:
+        json.dump(generators.csvw_metadata(columns), f)
+    return "file://{}/data-metadata.json".format(directory)
+
+
+@pytest.fixture
+def data_url(tmp_path):
+    """File url of a generated metadata document with 10 annotations and 5 columns."""
+    return write_metadata(tmp_path)
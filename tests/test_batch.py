@@ -0,0 +1,30 @@
+import json
+from collections import Counter
+
+import maptomethod
+from benchmarks import generators
+
+
+def test_batch_resolves_empty_template_once(tmp_path, monkeypatch):
+    for name in ("template", "data-a", "data-b", "data-c"):
+        with open(tmp_path / "{}-metadata.json".format(name), "w") as f:
+            json.dump(generators.csvw_metadata(5), f)
+    template_url = "file://{}/template-metadata.json".format(tmp_path)
+    data_urls = ["file://{}/data-{}-metadata.json".format(tmp_path, name) for name in "abc"]
+    query_entities = maptomethod.query_entities
+    calls = Counter()
+
+    def spy(url, *args, **kwargs):
+        calls[url] += 1
+        return query_entities(url, *args, **kwargs)
+
+    monkeypatch.setattr(maptomethod, "query_entities", spy)
+    results = maptomethod.Mapper.batch(
+        template_url,
+        [(url, []) for url in data_urls],
+        # no entity of the template document is an information content entity
+        template_object_types=[maptomethod.InformtionContentEntity],
+    )
+    assert [result["data_url"] for result in results] == data_urls
+    assert all("error" not in result for result in results)
+    assert calls == Counter({template_url: 1, **{url: 1 for url in data_urls}})
@@ -0,0 +1,27 @@
+import pytest
+
+import maptomethod
+from conftest import request
+
+
+def delete_cache(headers=None):
+    return request("DELETE", "/api/cache", headers=headers or {})
+
+
+def test_purging_caches_is_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(maptomethod, "CACHE_ADMIN_TOKEN", "")
+    assert delete_cache().status_code == 404
+    assert delete_cache({"X-Admin-Token": ""}).status_code == 404
+
+
+@pytest.mark.parametrize("headers", [None, {"X-Admin-Token": "wrong"}, {"X-Profile-Token": "secret"}])
+def test_purging_caches_requires_token(monkeypatch, headers):
+    monkeypatch.setattr(maptomethod, "CACHE_ADMIN_TOKEN", "secret")
+    assert delete_cache(headers).status_code == 403
+
+
+def test_purging_caches_with_token(monkeypatch):
+    monkeypatch.setattr(maptomethod, "CACHE_ADMIN_TOKEN", "secret")
+    response = delete_cache({"X-Admin-Token": "secret"})
+    assert response.status_code == 200, response.text
+    assert set(response.json()) >= {"fetch", "graph", "entity_index"}
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+
+import maptomethod
+from benchmarks import generators
+from conftest import client, write_metadata
+
+DELAY = 2.0
+
+
+def test_slow_fetch_does_not_delay_other_requests(tmp_path):
+    slow_dir = tmp_path / "slow"
+    slow_dir.mkdir()
+    fast_url = write_metadata(tmp_path, 20)
+    write_metadata(slow_dir, 20)
+
+    async def requests(slow_url):
+        async with client() as session:
+            slow = asyncio.create_task(session.get("/api/types", params={"url": slow_url}))
+            # let the slow request reach the upstream
+            await asyncio.sleep(0.2)
+            start = time.perf_counter()
+            fast = await session.get("/api/entities", params={"url": fast_url})
+            fast_seconds = time.perf_counter() - start
+            slow_pending = not slow.done()
+            return fast, fast_seconds, slow_pending, await slow
+
+    with generators.serve(slow_dir, delay=DELAY) as base_url:
+        fast, fast_seconds, slow_pending, slow = asyncio.run(
+            requests(base_url + "data-metadata.json")
+        )
+
+    assert fast.status_code == 200, fast.text
+    assert len(fast.json()["entities"]) == 20 + 10
+    assert slow_pending
+    assert fast_seconds < DELAY / 2
+    assert slow.status_code == 200, slow.text
+
+
+def test_create_mapper_keeps_empty_entities_resolved_in_executor(data_url, monkeypatch):
+    query_entities = maptomethod.query_entities
+    threads = []
+
+    def spy(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return query_entities(*args, **kwargs)
+
+    monkeypatch.setattr(maptomethod, "query_entities", spy)
+    mapper = asyncio.run(
+        maptomethod.acreate_mapper(
+            data_url=data_url,
+            template_url=data_url,
+            use_template_rowwise=False,
+            # no entity of the data document is an information content entity
+            template_object_types=[maptomethod.InformtionContentEntity],
+        )
+    )
+    assert mapper.objects == {}
+    assert len(mapper.subjects) == 5 + 10
+    assert len(threads) == 2
+    assert threading.main_thread().name not in threads
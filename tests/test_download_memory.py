@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+from benchmarks import download_memory, generators
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists("/proc/self/status"), reason="peak RSS is read from /proc"
+)
+
+COLUMNS = 200000
+
+
+@pytest.fixture(scope="module")
+def document(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("download")
+    with open(directory / "data-metadata.json", "w") as f:
+        json.dump(generators.csvw_metadata(COLUMNS), f)
+    with generators.serve(str(directory)) as base_url:
+        yield base_url + "data-metadata.json", os.path.getsize(directory / "data-metadata.json")
+
+
+def test_download_holds_the_body_once(document):
+    url, size = document
+    env = dict(os.environ, PARSE_MAX_BYTES="0", FETCH_MAX_BYTES="0")
+    result = download_memory.run(url, "streamed", env)
+    assert result["status"] == 200
+    assert result["size"] == size
+    # chunks and their joined copy would take twice the size
+    assert result["peak_rss_growth_bytes"] < 1.5 * size
+
+
+def test_download_over_the_limit_is_rejected_early(document):
+    url, size = document
+    env = dict(os.environ, PARSE_MAX_BYTES="0", FETCH_MAX_BYTES=str(size // 2))
+    result = download_memory.run(url, "rejected", env)
+    assert result["status"] == 413
+    assert result["peak_rss_growth_bytes"] < size // 4
@@ -0,0 +1,219 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import cache
+import maptomethod
+
+BODY = b'{"@context": "http://www.w3.org/ns/csvw", "tables": []}'
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 05 Oct 2026 10:00:00 GMT"
+
+
+class Upstream:
+    """Origin server answering with BODY and its validators, 304 for a matching If-None-Match."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = []
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                upstream.requests.append(dict(self.headers))
+                time.sleep(upstream.delay)
+                if self.headers.get("If-None-Match") == ETAG:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", ETAG)
+                self.send_header("Last-Modified", LAST_MODIFIED)
+                self.send_header("Content-Length", str(len(BODY)))
+                self.end_headers()
+                self.wfile.write(BODY)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/data-metadata.json".format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    yield server
+    server.close()
+
+
+def use_cache(monkeypatch, **kwargs) -> cache.FetchCache:
+    """Replace the fetch cache and coalescing of maptomethod by fresh ones."""
+    options = dict(max_bytes=1 << 20, max_entries=16, ttl=60)
+    options.update(kwargs)
+    fetch_cache = cache.FetchCache(**options)
+    monkeypatch.setattr(maptomethod, "fetch_cache", fetch_cache)
+    monkeypatch.setitem(maptomethod.flights, "fetch", cache.SingleFlight())
+    return fetch_cache
+
+
+def fetch(url, authorization=None) -> bytes:
+    return maptomethod.open_file(url, authorization)[0]
+
+
+def test_fresh_entry_is_served_without_request(upstream, monkeypatch):
+    fetch_cache = use_cache(monkeypatch)
+    assert fetch(upstream.url) == BODY
+    assert fetch(upstream.url) == BODY
+    assert len(upstream.requests) == 1
+    assert "If-None-Match" not in upstream.requests[0]
+    assert (fetch_cache.counters["misses"], fetch_cache.counters["hits"]) == (1, 1)
+
+
+def test_expired_entry_is_revalidated(upstream, monkeypatch):
+    fetch_cache = use_cache(monkeypatch, ttl=0.2)
+    assert fetch(upstream.url) == BODY
+    assert fetch(upstream.url) == BODY
+    assert len(upstream.requests) == 1
+    time.sleep(0.3)
+    # the origin answers 304, the cached body is reused
+    assert fetch(upstream.url) == BODY
+    assert len(upstream.requests) == 2
+    assert upstream.requests[1]["If-None-Match"] == ETAG
+    assert upstream.requests[1]["If-Modified-Since"] == LAST_MODIFIED
+    assert fetch_cache.counters["revalidated"] == 1
+    assert fetch_cache.counters["misses"] == 1
+    # revalidated entries are fresh again
+    assert fetch(upstream.url) == BODY
+    assert len(upstream.requests) == 2
+
+
+def test_entries_are_separate_per_authorization(upstream, monkeypatch):
+    fetch_cache = use_cache(monkeypatch)
+    for authorization in ("Bearer a", "Bearer b", "Bearer a", None, "Bearer b"):
+        assert fetch(upstream.url, authorization) == BODY
+    assert [request.get("Authorization") for request in upstream.requests] == [
+        "Bearer a",
+        "Bearer b",
+        None,
+    ]
+    assert all("If-None-Match" not in request for request in upstream.requests)
+    assert fetch_cache.stats()["entries"] == 3
+    # the same body is stored once
+    assert fetch_cache.stats()["blobs"] == 1
+
+
+def test_concurrent_fetches_share_one_request(monkeypatch):
+    use_cache(monkeypatch)
+    server = Upstream(delay=0.5)
+    results = []
+    try:
+        threads = [
+            threading.Thread(target=lambda: results.append(fetch(server.url))) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.close()
+    assert results == [BODY] * 5
+    assert len(server.requests) == 1
+
+
+def test_workers_share_fetched_documents(upstream, tmp_path, monkeypatch):
+    path = str(tmp_path / "shared.db")
+    first = use_cache(monkeypatch, shared=cache.SharedCache(path, 1 << 20))
+    assert fetch(upstream.url, "Bearer a") == BODY
+    # another worker, with its own memory tier and connection to the same file
+    second = use_cache(monkeypatch, shared=cache.SharedCache(path, 1 << 20))
+    assert fetch(upstream.url, "Bearer a") == BODY
+    assert len(upstream.requests) == 1
+    assert second.counters["shared_hits"] == 1
+    assert second.shared.stats()["hits"] == 1
+    # not shared across authorizations
+    assert fetch(upstream.url, "Bearer b") == BODY
+    assert len(upstream.requests) == 2
+    # results derived from a body are shared as well
+    first.shared.put_result("entities", {"column": {"text": "width"}})
+    assert second.shared.get_result("entities") == {"column": {"text": "width"}}
+
+
+def test_coalesced_calls_are_counted():
+    flight = cache.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait()
+        return "result"
+
+    def call():
+        results.append(flight.do(("url", None), slow))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait()
+    threads += [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()["coalesced"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert flight.stats()["in_flight"] == 1
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 4
+    stats = flight.stats()
+    assert (stats["calls"], stats["coalesced"], stats["in_flight"]) == (1, 3, 0)
+    assert stats["coalesced_rate"] == 0.75
+
+
+def fetch_concurrently(urls) -> list:
+    """Fetch urls in parallel threads, returning their bodies or HTTPExceptions in order."""
+    results = [None] * len(urls)
+
+    def run(index):
+        try:
+            results[index] = fetch(urls[index])
+        except maptomethod.HTTPException as err:
+            results[index] = err
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(urls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.mark.parametrize("pool_timeout", [5.0, 0.1])
+def test_connections_per_host_are_limited(monkeypatch, pool_timeout):
+    use_cache(monkeypatch)
+    monkeypatch.setattr(maptomethod, "_session", None)
+    monkeypatch.setattr(maptomethod, "HTTP_POOL_MAXSIZE", 1)
+    monkeypatch.setattr(maptomethod, "HTTP_POOL_TIMEOUT", pool_timeout)
+    server = Upstream(delay=0.3)
+    try:
+        # different urls, so the downloads are not coalesced
+        results = fetch_concurrently(["{}?part={}".format(server.url, i) for i in range(3)])
+        pools = maptomethod.http_pool_stats()
+    finally:
+        server.close()
+    assert [pool["connections"] for pool in pools] == [1]
+    if pool_timeout > 1:
+        assert results == [BODY] * 3
+        assert pools[0]["requests"] == 3
+    else:
+        assert results.count(BODY) == 1
+        assert sorted(err.status_code for err in results if err != BODY) == [503, 503]
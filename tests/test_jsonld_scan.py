@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import jsonld_scan
+import maptomethod
+from benchmarks.generators import CONTEXT, csvw_metadata
+
+CLASSES = [maptomethod.OA.Annotation, maptomethod.CSVW.Column]
+
+# documents exercising features the scanner handles or has to hand over to rdflib
+VARIANTS = {
+    "base prefix": {
+        "@context": dict(CONTEXT, base="http://example.org/base/"),
+        "@id": "base:doc",
+        "notes": {"@id": "base:a1", "@type": "oa:Annotation", "label": "a"},
+    },
+    "relative ids without base": {
+        "@context": {"@vocab": "http://www.w3.org/ns/csvw#"},
+        "columns": [{"@id": "c1", "@type": "Column", "name": "c1"}],
+    },
+    "value objects, sets and lists": {
+        "@context": CONTEXT,
+        "columns": {
+            "@list": [
+                {"@id": "c1", "@type": ["Column"], "name": {"@value": "c1"}},
+                {"@id": "c2", "@type": "Column", "name": {"@set": ["c2"]}},
+            ]
+        },
+    },
+    "language map label": {
+        "@context": dict(CONTEXT, label={"@id": "rdfs:label", "@container": "@language"}),
+        "notes": {"@id": "a1", "@type": "oa:Annotation", "label": {"en": "a"}},
+    },
+    "keyword aliases": {
+        "@context": dict(CONTEXT, id="@id", type="@type"),
+        "columns": [{"id": "c1", "type": "Column", "name": "c1"}],
+    },
+    "named graph": {
+        "@context": CONTEXT,
+        "@graph": [{"@id": "c1", "@type": "Column", "name": "c1"}],
+    },
+    "two labels": {
+        "@context": CONTEXT,
+        "columns": [{"@id": "c1", "@type": "Column", "name": ["c1", "one"]}],
+    },
+    "merged node": {
+        "@context": CONTEXT,
+        "columns": [{"@id": "c1", "@type": "Column"}],
+        "notes": [{"@id": "c1", "name": "c1"}],
+    },
+}
+
+# documents rdflib gives random blank node names for, the scanner must hand them over
+FALLBACK_VARIANTS = {
+    "blank node": {
+        "@context": CONTEXT,
+        "columns": [{"@type": "Column", "name": "c1"}],
+    },
+}
+
+
+def analyze(monkeypatch, data, fast):
+    monkeypatch.setattr(maptomethod, "JSONLD_FAST_PATH", fast)
+    maptomethod.graph_cache.clear()
+    return maptomethod.analyze_data(data, "json-ld", "http://example.org/meta.json", set(CLASSES))
+
+
+@pytest.mark.parametrize("columns, tables", [(1, 1), (50, 1), (200, 3)])
+def test_scan_matches_rdflib_on_csvw_metadata(monkeypatch, columns, tables):
+    data = json.dumps(csvw_metadata(columns, tables=tables)).encode()
+    assert jsonld_scan.scan(data, CLASSES, maptomethod.LABEL_PREDICATES) is not None
+    scanned = analyze(monkeypatch, data, True)
+    assert scanned == analyze(monkeypatch, data, False)
+    assert len(scanned["entities"]) == 10 + columns * tables
+
+
+@pytest.mark.parametrize("name", sorted(VARIANTS))
+def test_scan_matches_rdflib_on_variants(monkeypatch, name):
+    data = json.dumps(VARIANTS[name]).encode()
+    assert analyze(monkeypatch, data, True) == analyze(monkeypatch, data, False)
+
+
+@pytest.mark.parametrize("name", sorted(FALLBACK_VARIANTS))
+def test_scan_hands_over_to_rdflib(name):
+    data = json.dumps(FALLBACK_VARIANTS[name]).encode()
+    assert jsonld_scan.scan(data, CLASSES, maptomethod.LABEL_PREDICATES) is None
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+
+import pytest
+import yaml
+
+import maptomethod
+
+TEXTS = {
+    "ascii": "specimen width",
+    "latin": "Spalte 3 (mm²) Prüfkörper",
+    "long": "word " * 40 + "end",
+    "long quoted": "a: b, " * 30 + "end",
+    "long url": "https://example.org/" + "segment/" * 20 + "?q=" + "v" * 30,
+    "emoji": "Temperatur 😀 grad",
+    "astral only": "𝔘𝔫𝔦𝔠𝔬𝔡𝔢",
+    "long emoji": "😀 text " * 30,
+    "multiline": "line one\n  line two \n" * 5,
+    "tab": "a\tb " * 40,
+    "next line": "x\x85y " * 40,
+    "byte order mark": "﻿start " * 20,
+    "control": "ctrl \x07 bell " * 15,
+}
+# libyaml writes keys longer than about 128 bytes as complex keys
+KEYS = {"short key": "width", "long key": "column_" * 30}
+
+
+def mapping(text, key="width"):
+    return OrderedDict(
+        [
+            ("prefixes", OrderedDict([("data", "https://example.org/data/")])),
+            (
+                "mappings",
+                OrderedDict(
+                    [
+                        (
+                            key,
+                            OrderedDict(
+                                [
+                                    ("sources", [["data-metadata.json~jsonpath", "$.tables[*]"]]),
+                                    ("s", "data:" + text),
+                                    ("po", [["rdfs:label", text], ["a", "csvw:Column"]]),
+                                ]
+                            ),
+                        )
+                    ]
+                ),
+            ),
+        ]
+    )
+
+
+def python_dump(value):
+    return yaml.dump(value, Dumper=maptomethod.Dumper, allow_unicode=True)
+
+
+@pytest.mark.parametrize("key", sorted(KEYS))
+@pytest.mark.parametrize("name", sorted(TEXTS))
+def test_dump_mapping_equals_python_emitter(name, key):
+    value = mapping(TEXTS[name], KEYS[key])
+    expected = python_dump(value)
+    assert maptomethod.dump_mapping(value) == expected
+    assert "".join(maptomethod.iter_dump_mapping(value)) == expected
+
+
+@pytest.mark.skipif(maptomethod.MappingDumper is maptomethod.Dumper, reason="libyaml emitter not used")
+@pytest.mark.parametrize("name", sorted(TEXTS))
+def test_libyaml_emitter_equals_python_emitter_where_used(name):
+    value = mapping(TEXTS[name])
+    if maptomethod.c_emitter_safe(value):
+        assert yaml.dump(value, Dumper=maptomethod.MappingDumper, allow_unicode=True) == python_dump(value)
+    else:
+        assert name not in ("ascii", "latin", "long", "long quoted", "long url")
+
+
+def test_long_keys_are_not_emitted_by_libyaml():
+    assert maptomethod.c_emitter_safe(mapping(TEXTS["ascii"]))
+    assert not maptomethod.c_emitter_safe(mapping(TEXTS["ascii"], KEYS["long key"]))
+
+
+def test_non_bmp_text_is_not_emitted_by_libyaml():
+    assert not maptomethod.c_emitter_safe(mapping(TEXTS["emoji"]))
+    assert "😀" in maptomethod.dump_mapping(mapping(TEXTS["emoji"]))
+
+
+def test_mapping_dumper_leaves_libyaml_dumper_unchanged():
+    if yaml.__with_libyaml__:
+        assert yaml.CDumper.yaml_representers[OrderedDict] is not maptomethod.dict_representer
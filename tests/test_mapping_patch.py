@@ -0,0 +1,28 @@
+import maptomethod
+from conftest import MAPPING, request
+
+
+def patch(mapping, delta, data_url):
+    return request(
+        "POST", "/api/mapping/patch", json={"mapping": mapping, "map": delta, "data_url": data_url}
+    )
+
+
+def test_patch_adds_and_removes_rules(data_url):
+    response = patch(MAPPING, {"Width": "table-0-column1", "Name": "annotation0"}, data_url)
+    assert response.status_code == 200, response.text
+    mapping = maptomethod.load_mapping(response.text)
+    assert list(mapping["mappings"]) == ["Width", "Name"]
+    assert dict(mapping["mappings"]["Width"]["condition"]["parameters"])["str2"] == "column1"
+
+    response = patch(response.text, {"Name": None}, data_url)
+    assert response.status_code == 200, response.text
+    assert list(maptomethod.load_mapping(response.text)["mappings"]) == ["Width"]
+
+
+def test_patch_rejects_unknown_subject_ids(data_url):
+    delta = {"Width": "table-0-column1", "Length": "no-such-column", "Name": "no-such-annotation"}
+    response = patch(MAPPING, delta, data_url)
+    assert response.status_code == 400
+    assert "no-such-column, no-such-annotation" in response.text
+    assert "table-0-column1" not in response.text
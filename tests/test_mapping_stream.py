@@ -0,0 +1,41 @@
+import pytest
+
+import maptomethod
+from conftest import MAPPING, request
+
+
+def test_lazy_mapping_output_checks_subjects_before_returning():
+    subjects = {"column": {"property": "label"}}
+    with pytest.raises(ValueError, match="column"):
+        maptomethod.get_mapping_output(
+            "file:///data-metadata.json",
+            False,
+            "https://example.org/data/",
+            "https://example.org/template/",
+            [("Width", "column")],
+            subjects,
+            maptomethod.ContentToBearingRelation,
+            iterators={"label": ("$.tables[*].tableSchema.columns[*]", "columns")},
+            lazy=True,
+        )
+
+
+def test_patch_streams_mapping(data_url):
+    response = request(
+        "POST", "/api/mapping/patch", json={"mapping": MAPPING, "map": {}, "data_url": data_url}
+    )
+    assert response.status_code == 200, response.text
+    assert response.text == maptomethod.dump_mapping(maptomethod.load_mapping(MAPPING))
+
+
+def test_patch_serialization_error_is_a_server_error(data_url, monkeypatch):
+    def failing(mapping, format="yaml"):
+        raise RuntimeError("cannot serialize")
+        yield
+
+    monkeypatch.setattr(maptomethod, "iter_dump_mapping", failing)
+    response = request(
+        "POST", "/api/mapping/patch", json={"mapping": MAPPING, "map": {}, "data_url": data_url}
+    )
+    assert response.status_code == 500
+    assert "cannot serialize" in response.text
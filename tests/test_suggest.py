@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+import suggest
+from benchmarks import suggest as suggest_benchmark
+
+
+def brute_force(index, text, limit, min_score):
+    query_grams = suggest.grams(text)
+    query_norm = sum(index.idf.get(gram, index.default_idf) for gram in query_grams)
+    scored = []
+    for name, subject_grams in index.grams.items():
+        shared = sum(index.idf[gram] for gram in query_grams & subject_grams)
+        norm = sum(index.idf[gram] for gram in subject_grams)
+        score = round(2 * shared / (query_norm + norm), 4)
+        if score >= min_score:
+            scored.append((name, score))
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+
+@pytest.mark.parametrize("labels", [suggest_benchmark.domain_labels, suggest_benchmark.diverse_labels])
+@pytest.mark.parametrize("limit, min_score", [(5, 0.3), (3, 0.0), (10, 0.6)])
+def test_query_equals_scoring_every_subject(labels, limit, min_score):
+    rng = random.Random(0)
+    objects = suggest_benchmark.entities("object", labels(200, rng))
+    subjects = suggest_benchmark.entities("subject", labels(300, rng))
+    index = suggest.SuggestionIndex(subjects)
+    for name, entity in objects.items():
+        text = suggest.entity_text(name, entity)
+        assert index.query(text, limit, min_score) == brute_force(index, text, limit, min_score)
+
+
+def test_suggest_skips_subjects_without_label_property():
+    objects = {"SpecimenWidth": {"uri": "http://example.org/SpecimenWidth", "property": "label", "text": "specimen width"}}
+    subjects = {
+        "width_unlabeled": {"uri": "http://example.org/width_unlabeled", "text": "specimen width"},
+        "width": {"uri": "http://example.org/width", "property": "label", "text": "specimen width"},
+        "gauge": {"uri": "http://example.org/gauge", "property": "label", "text": "gauge length"},
+    }
+    result = suggest.suggest(objects, subjects)
+    assert [candidate["subject"] for candidate in result["candidates"]["SpecimenWidth"]] == ["width"]
+    assert result["maplist"] == [["SpecimenWidth", "width"]]
@@ -0,0 +1,8 @@
+import maptomethod
+from conftest import request
+
+
+def test_types_of_too_large_document_are_rejected_with_413(data_url, monkeypatch):
+    monkeypatch.setattr(maptomethod, "PARSE_MAX_BYTES", 1000)
+    response = request("GET", "/api/types", params={"url": data_url})
+    assert response.status_code == 413, response.text
@@ -0,0 +1,52 @@
+import asyncio
+from collections import Counter
+
+from fastapi.responses import HTMLResponse
+
+import app
+import maptomethod
+from benchmarks import generators
+from conftest import client
+
+
+def test_map_reuses_empty_entities_of_workspace(tmp_path, data_url, monkeypatch):
+    query_entities = maptomethod.query_entities
+    calls = Counter()
+
+    def spy(url, *args, **kwargs):
+        calls[url] += 1
+        return query_entities(url, *args, **kwargs)
+
+    monkeypatch.setattr(maptomethod, "query_entities", spy)
+    # only the entities resolved per page are of interest, not the html
+    monkeypatch.setattr(
+        app.templates,
+        "TemplateResponse",
+        lambda name, context, **kwargs: HTMLResponse(context.get("filename") or ""),
+    )
+
+    async def requests(url):
+        async with client() as session:
+            created = await session.post(
+                "/create_mapper",
+                data={
+                    "data_url": url,
+                    "template_url": url,
+                    "advanced-data_subject_types": str(maptomethod.CSVW.Column),
+                    # no entity of the data document is an information content entity
+                    "advanced-template_object_types": str(maptomethod.InformtionContentEntity),
+                    "advanced-mapping_predicate_uri": str(maptomethod.ContentToBearingRelation),
+                },
+            )
+            queried = sum(calls.values())
+            mapped = await session.post("/map", data={})
+            return created, queried, mapped
+
+    with generators.serve(tmp_path) as base_url:
+        created, queried, mapped = asyncio.run(requests(base_url + "data-metadata.json"))
+
+    assert created.status_code == 200, created.text
+    assert queried == 2
+    assert mapped.status_code == 200, mapped.text
+    assert mapped.text == "data-map.yaml"
+    assert sum(calls.values()) == queried
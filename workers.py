@@ -0,0 +1,109 @@
+import threading
+import traceback
+from typing import Callable
+
+
+class WorkerDied(Exception):
+    """The worker process running a task exited before returning a result."""
+
+
+def worker_main(conn) -> None:
+    """Loop of a worker process: receive (func, args), send back (ok, result or exception)."""
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            reply = (True, func(*args))
+        except Exception as err:
+            reply = (False, err)
+        try:
+            conn.send(reply)
+        except Exception:
+            # results or exceptions that can not be pickled
+            conn.send((False, RuntimeError(traceback.format_exc())))
+
+
+class WorkerPool:
+    def __init__(self, processes: int, context):
+        """Worker processes running one task at a time, which can be killed one by one.
+
+        Unlike a concurrent.futures.ProcessPoolExecutor, a task running longer
+        than its timeout is stopped by killing only the process running it, so
+        the tasks of the other workers are not affected. Processes are started
+        on demand up to processes and reused for later tasks.
+
+        Args:
+            processes (int): Maximum number of worker processes
+            context: multiprocessing context to start the processes with
+        """
+        self.context = context
+        self._slots = threading.BoundedSemaphore(processes)
+        # started workers waiting for a task, as (process, connection) pairs
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _start(self) -> tuple:
+        conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=worker_main, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, conn
+
+    def _kill(self, process, conn) -> None:
+        process.kill()
+        process.join()
+        conn.close()
+
+    def run(self, func: Callable, args: tuple, timeout: float):
+        """Run func(*args) in a worker process and return its result.
+
+        Waits for a free worker first, the timeout only covers running the task.
+
+        Args:
+            func (Callable): Module level function, picklable by reference
+            args (tuple): Picklable arguments
+            timeout (float): Seconds the task may run
+
+        Raises:
+            TimeoutError: If the task ran longer than timeout, its worker is killed
+            WorkerDied: If the worker exited while running the task
+            Exception: Exceptions raised by func are raised again
+
+        Returns:
+            Result of func
+        """
+        with self._slots:
+            with self._lock:
+                worker = self._idle.pop() if self._idle else None
+            if worker is None or not worker[0].is_alive():
+                if worker is not None:
+                    self._kill(*worker)
+                worker = self._start()
+            process, conn = worker
+            try:
+                conn.send((func, args))
+            except (EOFError, OSError):
+                self._kill(process, conn)
+                raise WorkerDied("worker process {} exited".format(process.pid))
+            except Exception:
+                # arguments that can not be pickled, nothing was sent
+                with self._lock:
+                    self._idle.append(worker)
+                raise
+            try:
+                finished = conn.poll(timeout)
+                if finished:
+                    ok, value = conn.recv()
+            except (EOFError, OSError):
+                self._kill(process, conn)
+                raise WorkerDied("worker process {} exited".format(process.pid))
+            if not finished:
+                self._kill(process, conn)
+                raise TimeoutError("task ran longer than {} seconds".format(timeout))
+            with self._lock:
+                self._idle.append(worker)
+        if not ok:
+            raise value
+        return value
@@ -0,0 +1,117 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+
+def new_workspace_id() -> str:
+    return uuid.uuid4().hex
+
+
+class MemoryWorkspaceStore:
+    def __init__(self, ttl: float, max_entries: int = 1000):
+        """In-memory store of mapping workspaces, expiring after ttl seconds without access.
+
+        Args:
+            ttl (float): Seconds a workspace is kept after its last access
+            max_entries (int, optional): Maximum number of workspaces, least recently used are dropped first. Defaults to 1000.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, workspace_id: str) -> Optional[dict]:
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(workspace_id)
+            if entry is None:
+                return None
+            self._entries[workspace_id] = (time.time(), entry[1])
+            self._entries.move_to_end(workspace_id)
+            return entry[1]
+
+    def put(self, workspace_id: str, workspace: dict) -> None:
+        with self._lock:
+            self._entries[workspace_id] = (time.time(), workspace)
+            self._entries.move_to_end(workspace_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, workspace_id: str) -> None:
+        with self._lock:
+            self._entries.pop(workspace_id, None)
+
+    def _expire(self) -> None:
+        limit = time.time() - self.ttl
+        while self._entries:
+            workspace_id, (accessed, _) = next(iter(self._entries.items()))
+            if accessed >= limit:
+                break
+            del self._entries[workspace_id]
+
+
+class SQLiteWorkspaceStore:
+    def __init__(self, path: str, ttl: float):
+        """SQLite backed store of mapping workspaces, shared by all workers using the same file.
+
+        Args:
+            path (str): Database file
+            ttl (float): Seconds a workspace is kept after its last access
+        """
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS workspaces (id TEXT PRIMARY KEY, accessed REAL, data TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def get(self, workspace_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM workspaces WHERE accessed < ?", (now - self.ttl,))
+            row = db.execute(
+                "SELECT data FROM workspaces WHERE id = ?", (workspace_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE workspaces SET accessed = ? WHERE id = ?", (now, workspace_id)
+            )
+        return json.loads(row[0])
+
+    def put(self, workspace_id: str, workspace: dict) -> None:
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO workspaces (id, accessed, data) VALUES (?, ?, ?)",
+                (workspace_id, time.time(), json.dumps(workspace)),
+            )
+
+    def delete(self, workspace_id: str) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM workspaces WHERE id = ?", (workspace_id,))
+
+
+def create_store(db_path: Optional[str], ttl: float, max_entries: int = 1000):
+    """Workspace store, SQLite backed if db_path is set, else in memory.
+
+    Args:
+        db_path (str, optional): SQLite database file
+        ttl (float): Seconds a workspace is kept after its last access
+        max_entries (int, optional): Maximum number of workspaces of the in-memory store. Defaults to 1000.
+    """
+    if db_path:
+        return SQLiteWorkspaceStore(db_path, ttl)
+    return MemoryWorkspaceStore(ttl, max_entries)